@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+"""
+    pack_batch.py
+        Author: Theodore Enns
+        Brief: A executable python script that solves many 0-1 knapsacks across a process pool.
+
+        usage: pack_batch.py [-h] [-w WORKERS] [-c CHUNKSIZE] [-e ENGINE] [-p]
+                             [--prefetch PREFETCH] [--fetch_concurrency FETCH_CONCURRENCY]
+                             [--fetch_timeout FETCH_TIMEOUT] [--fetch_retries FETCH_RETRIES]
+                             [--cache_dir CACHE_DIR] [--cache_max_age CACHE_MAX_AGE]
+                             [--cache_max_mb CACHE_MAX_MB] [--memo_entries MEMO_ENTRIES]
+                             [--memo_dir MEMO_DIR]
+                             manifest
+
+        Streams one json result per line, in manifest order, for each (suitcase, parts) pair.
+        Each line is the object pack_bot.py would print for that pair (or an error field
+        if the pair could not be solved), so a shift of robots pays for interpreter
+        start-up, imports and argument parsing once rather than once per robot.
+
+        positional arguments:
+          manifest              a json list of {"suitcase_source": ..., "parts_source": ...}
+                                objects, or a stream with one such object per line (jsonl);
+                                "-" reads the stream from stdin
+
+        optional arguments:
+          -h, --help            show this help message and exit
+          -w WORKERS, --workers WORKERS
+                                number of worker processes (defaults to the cpu count; 1
+                                solves in this process)
+          -c CHUNKSIZE, --chunksize CHUNKSIZE
+                                number of pairs handed to a worker at a time
+          -e ENGINE, --engine ENGINE
+                                the solver engine to use (see pack_bot.py)
+          -p, --preprocess      excludes, fixes and rescales parts before solving
+          --prefetch PREFETCH   fetch the distinct sources of this many pairs at a time
+                                up front instead of in the workers (0 disables)
+          --fetch_concurrency FETCH_CONCURRENCY
+                                maximum number of fetches in flight while prefetching
+          --fetch_timeout FETCH_TIMEOUT
+                                seconds before a fetch times out
+          --fetch_retries FETCH_RETRIES
+                                times a failed fetch is retried, with exponential backoff
+          --cache_dir CACHE_DIR, --cache_max_age CACHE_MAX_AGE, --cache_max_mb CACHE_MAX_MB
+                                on-disk http cache shared by all workers (see pack_bot.py)
+          --memo_entries MEMO_ENTRIES
+                                solutions each worker keeps in memory for identical problems
+          --memo_dir MEMO_DIR   on-disk solution store shared by all workers
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+from itertools import chain, imap, islice
+from pack_bot import collate_solution
+from pb_cache import HttpCache, DEFAULT_MAX_BYTES
+from pb_get_json import ConnectionPool, set_default_pool, set_default_cache, fetch_many, grab_dicts_from
+from pb_get_json import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, DEFAULT_RETRIES
+from pb_knapsack import KnapSack01Solver, ENGINES
+from pb_memo import SolutionCache, DEFAULT_MAX_ENTRIES
+
+# Solver options and solution cache for the current process, set by init_worker()
+_options = {'engine': 'dp', 'reduce': False, 'memo': SolutionCache()}
+
+
+def init_worker(engine, reduce, fetch_timeout=DEFAULT_TIMEOUT, fetch_retries=DEFAULT_RETRIES, cache_options=None,
+                memo_options=(DEFAULT_MAX_ENTRIES, None)):
+    """
+    Pool initializer recording the solver options every pair in the batch is solved with. Each
+        worker keeps its own pool of keep-alive connections across the pairs it fetches, and its
+        own in-memory solution cache.
+
+    :param cache_options: (directory, max_bytes, max_age) of the shared on-disk cache, or None
+    :param memo_options: (max_entries, directory) of the solution cache
+    """
+    _options['engine'] = engine
+    _options['reduce'] = reduce
+    _options['memo'] = SolutionCache(*memo_options)
+    set_default_pool(ConnectionPool(timeout=fetch_timeout, retries=fetch_retries))
+    if cache_options is not None:
+        set_default_cache(HttpCache(*cache_options))
+
+
+def entry_sources(entry):
+    """
+    Checks a manifest entry names both of its sources
+
+    :param entry: deserialized manifest entry
+    :return: suitcase_source, parts_source
+    """
+    if not isinstance(entry, dict) or 'suitcase_source' not in entry or 'parts_source' not in entry:
+        raise ValueError("expected a json object with suitcase_source and parts_source fields")
+    return entry['suitcase_source'], entry['parts_source']
+
+
+def solve_entry(entry):
+    """
+    Fetches (unless prefetched) and solves one manifest entry
+
+    :param entry: dict with suitcase_source and parts_source fields, or suitcase and parts json
+        strings if prefetched
+    :return: the result dict pack_bot.py would print, or a dict with an error field
+    """
+    try:
+        if isinstance(entry, dict) and 'error' in entry:
+            raise Exception(entry['error'])
+        if isinstance(entry, dict) and 'parts' in entry:
+            suitcase = json.loads(entry['suitcase'])
+            parts = json.loads(entry['parts'])
+        else:
+            suitcase, parts = grab_dicts_from(list(entry_sources(entry)))
+        solver = KnapSack01Solver(parts, suitcase['volume'])
+        total_value, indices = _options['memo'].solve(solver, _options['engine'], _options['reduce'])
+        return collate_solution(parts, total_value, indices, solver)
+    except Exception as error:
+        return {"error": str(error)}
+
+
+def read_manifest(stream):
+    """
+    Yields manifest entries from a json list or a jsonl stream, reading jsonl lazily. A jsonl line
+        that is not json is yielded as an entry with an error field, so it gets a result line of its
+        own rather than ending the batch.
+
+    :param stream: file object holding the manifest
+    :return: generator of entry dicts
+    """
+    # readline() rather than iterating the file, which reads ahead on python 2
+    lines = iter(stream.readline, '')
+    first_line = next(lines, '')
+    if first_line.lstrip().startswith('['):
+        for entry in json.loads(first_line + stream.read()):
+            yield entry
+        return
+    for line in chain([first_line], lines):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                yield {"error": "malformed manifest line (%s)" % error}
+
+
+def prefetch_entries(entries, window, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Attaches the fetched json of each entry's sources, fetching the distinct sources of window
+        entries at a time concurrently (robots often share a suitcase)
+
+    :param entries: iterable of entry dicts
+    :param window: number of entries whose sources are fetched together
+    :param concurrency: maximum number of fetches in flight
+    :return: generator of entry dicts with suitcase and parts json strings (or an error field)
+    """
+    entries = iter(entries)
+    while True:
+        batch = []
+        for entry in islice(entries, window):
+            if isinstance(entry, dict) and 'error' in entry:
+                batch.append((entry, None))
+                continue
+            try:
+                batch.append((entry, entry_sources(entry)))
+            except ValueError as error:
+                batch.append(({"error": str(error)}, None))
+        if not batch:
+            return
+        sources = sorted(set(source for entry, pair in batch if pair is not None for source in pair))
+        fetched = dict(zip(sources, fetch_many(sources, concurrency, return_errors=True)))
+        for entry, pair in batch:
+            if pair is None:
+                yield entry
+                continue
+            suitcase = fetched[pair[0]]
+            parts = fetched[pair[1]]
+            entry = dict(entry)
+            for data in (suitcase, parts):
+                if isinstance(data, Exception):
+                    entry['error'] = str(data)
+            entry['suitcase'] = suitcase
+            entry['parts'] = parts
+            yield entry
+
+
+def solve_batch(entries, workers=None, chunksize=8, engine='dp', reduce=False,
+                fetch_timeout=DEFAULT_TIMEOUT, fetch_retries=DEFAULT_RETRIES, cache_options=None,
+                memo_options=(DEFAULT_MAX_ENTRIES, None)):
+    """
+    Solves manifest entries over a process pool
+
+    :param entries: iterable of entry dicts
+    :param workers: number of worker processes, None for the cpu count, 1 to solve in this process
+    :param chunksize: number of entries handed to a worker at a time
+    :return: generator of result dicts, in the order of entries
+    """
+    worker_options = (engine, reduce, fetch_timeout, fetch_retries, cache_options, memo_options)
+    if workers == 1:
+        init_worker(*worker_options)
+        for result in imap(solve_entry, entries):
+            yield result
+        return
+    pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=worker_options)
+    try:
+        for result in pool.imap(solve_entry, entries, chunksize):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def main():
+    # parse args
+    parser = argparse.ArgumentParser(description=
+                                     "Streams a json result per line for each (suitcase, parts) pair in a manifest")
+    parser.add_argument("-w", "--workers", type=int, required=False, default=None,
+                        help="number of worker processes (defaults to the cpu count; 1 solves in this process)")
+    parser.add_argument("-c", "--chunksize", type=int, required=False, default=8,
+                        help="number of pairs handed to a worker at a time")
+    parser.add_argument("-e", "--engine", choices=["auto"] + sorted(ENGINES), required=False, default="dp",
+                        help="the solver engine to use (see pack_bot.py)")
+    parser.add_argument("-p", "--preprocess", action="store_true", required=False, default=False,
+                        help="excludes, fixes and rescales parts before solving")
+    parser.add_argument("--prefetch", type=int, required=False, default=0,
+                        help="fetch the distinct sources of this many pairs at a time up front instead of "
+                             "in the workers (0 disables)")
+    parser.add_argument("--fetch_concurrency", type=int, required=False, default=DEFAULT_CONCURRENCY,
+                        help="maximum number of fetches in flight while prefetching")
+    parser.add_argument("--fetch_timeout", type=float, required=False, default=DEFAULT_TIMEOUT,
+                        help="seconds before a fetch times out")
+    parser.add_argument("--fetch_retries", type=int, required=False, default=DEFAULT_RETRIES,
+                        help="times a failed fetch is retried, with exponential backoff")
+    parser.add_argument("--cache_dir", type=str, required=False, default=None,
+                        help="on-disk http cache shared by all workers (see pack_bot.py)")
+    parser.add_argument("--cache_max_age", type=float, required=False, default=None,
+                        help="seconds a cached source is used without revalidating")
+    parser.add_argument("--cache_max_mb", type=int, required=False, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="MB of cached sources kept before evicting the least recently used")
+    parser.add_argument("--memo_entries", type=int, required=False, default=DEFAULT_MAX_ENTRIES,
+                        help="solutions each worker keeps in memory for identical problems")
+    parser.add_argument("--memo_dir", type=str, required=False, default=None,
+                        help="on-disk solution store shared by all workers")
+    parser.add_argument("manifest", type=str,
+                        help="a json list or jsonl stream of suitcase_source/parts_source objects ('-' for stdin)")
+    args = parser.parse_args()
+
+    cache_options = None
+    if args.cache_dir is not None:
+        cache_options = (args.cache_dir, args.cache_max_mb * 1024 * 1024, args.cache_max_age)
+    stream = sys.stdin if args.manifest == '-' else open(args.manifest, 'r')
+    try:
+        entries = read_manifest(stream)
+        if args.prefetch > 0:
+            set_default_pool(ConnectionPool(timeout=args.fetch_timeout, retries=args.fetch_retries))
+            if cache_options is not None:
+                set_default_cache(HttpCache(*cache_options))
+            entries = prefetch_entries(entries, args.prefetch, args.fetch_concurrency)
+        for result in solve_batch(entries, args.workers, args.chunksize, args.engine, args.preprocess,
+                                  args.fetch_timeout, args.fetch_retries, cache_options,
+                                  (args.memo_entries, args.memo_dir)):
+            sys.stdout.write(json.dumps(result) + '\n')
+            sys.stdout.flush()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+
+"""
+    pack_bench.py
+        Author: Theodore Enns
+        Brief: A executable python script that benchmarks the solver engines and pack_bot.py.
+
+        usage: pack_bench.py [-h] [-o OUTPUT] [--seed SEED] [--repeat REPEAT] [--timeout TIMEOUT]
+                             [--scale SCALE] [--scenarios SCENARIO [SCENARIO ...]]
+                             [--engines ENGINE [ENGINE ...]] [--skip_end_to_end]
+                             [--compare BASELINE] [--tolerance TOLERANCE]
+
+        Generates seeded synthetic problems (see SCENARIOS), times every engine listed for each
+        with KnapSack01Solver and, for some, the whole pack_bot.py run on local files, and writes
+        the results as json so runs on different commits can be compared. Each case runs in its
+        own process, so its peak resident memory is its own, and a case that runs past TIMEOUT is
+        recorded as such rather than holding up the rest. Results also count the dp cells and search
+        nodes each case evaluated (table_cells being n * (V + 1)), and pack_bot.py cases keep the
+        phase breakdown of its --stats report. A parallel engine case also records its CPU
+        utilization and, when the scenario ran the numpy engine before it, its speedup: the
+        numpy engine's wall time over its own on the same problem.
+
+        Instance kinds follow the usual knapsack benchmark families (volumes drawn from
+        1..max_volume, capacity a fraction of the total part volume):
+          uncorrelated          values drawn independently of volumes
+          weakly_correlated     values within max_volume / 10 of the volume
+          strongly_correlated   values are the volume plus max_volume / 10 (hard for bounds)
+          subset_sum            values equal the volume (every full packing ties)
+
+        optional arguments:
+          -h, --help            show this help message and exit
+          -o OUTPUT, --output OUTPUT
+                                file the json results are written to (defaults to stdout)
+          --seed SEED           seed of the problem generators
+          --repeat REPEAT       runs of each case; the fastest is kept
+          --timeout TIMEOUT     seconds a case may run for
+          --scale SCALE         multiplies the part counts of every scenario
+          --scenarios SCENARIO [SCENARIO ...]
+                                only runs these scenarios
+          --engines ENGINE [ENGINE ...]
+                                only runs these engines
+          --skip_end_to_end     only benchmarks the solver
+          --compare BASELINE    prints the time of each case relative to a previous results
+                                file, exiting with 1 if any is slower by more than TOLERANCE
+          --tolerance TOLERANCE
+                                relative slowdown allowed by --compare (0.25 is 25%)
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pb_knapsack import KnapSack01Solver, NUMPY_ENGINES, numpy
+from pb_stats import peak_memory_kb, cpu_seconds, resource
+
+# (name, kind, part count, max part volume, capacity as a fraction of the total part volume,
+#   engines timed with KnapSack01Solver, engine timed end to end through pack_bot.py or None)
+SCENARIOS = [
+    ('server', 'uncorrelated', 44, 100, 0.7, ['dp', 'bits', 'numpy', 'hirschberg', 'bnb', 'core', 'auto'], 'auto'),
+    ('many_parts', 'uncorrelated', 2000, 100, 0.05, ['bits', 'numpy', 'bnb', 'core', 'auto'], 'auto'),
+    ('huge_capacity', 'uncorrelated', 100, 20000, 0.5, ['numpy', 'parallel', 'core', 'auto'], None),
+    ('huge_volumes', 'uncorrelated', 32, 10 ** 8, 0.5, ['mitm', 'bnb', 'sparse', 'auto'], 'auto'),
+    ('weakly_correlated', 'weakly_correlated', 200, 100, 0.5, ['bits', 'numpy', 'bnb', 'core', 'auto'], None),
+    ('strongly_correlated', 'strongly_correlated', 100, 100, 0.5, ['bits', 'numpy', 'bnb', 'core', 'auto'], 'auto'),
+    ('huge_correlated', 'strongly_correlated', 32, 10 ** 8, 0.5, ['mitm', 'sparse', 'auto'], None),
+    ('subset_sum', 'subset_sum', 100, 1000, 0.5, ['bits', 'numpy', 'bnb', 'core', 'auto'], None),
+]
+
+DEFAULT_SEED = 1584
+DEFAULT_TIMEOUT = 30.0
+
+
+def generate_problem(kind, count, max_volume, capacity_ratio, seed):
+    """
+    Builds a seeded synthetic problem
+
+    :param kind: one of uncorrelated, weakly_correlated, strongly_correlated, subset_sum
+    :param count: number of parts
+    :param max_volume: part volumes are drawn from 1..max_volume
+    :param capacity_ratio: suitcase volume as a fraction of the total part volume
+    :param seed: seed of the generator
+    :return: suitcase dict, parts list
+    """
+    generator = random.Random(seed)
+    spread = max(1, max_volume // 10)
+    parts = []
+    for index in xrange(count):
+        volume = generator.randint(1, max_volume)
+        if kind == 'uncorrelated':
+            value = generator.randint(1, max_volume)
+        elif kind == 'weakly_correlated':
+            value = max(1, volume + generator.randint(-spread, spread))
+        elif kind == 'strongly_correlated':
+            value = volume + spread
+        elif kind == 'subset_sum':
+            value = volume
+        else:
+            raise ValueError("Unknown instance kind: %s" % kind)
+        parts.append({"id": "part-%d" % (index + 1), "volume": volume, "value": value})
+    suitcase = {"volume": int(capacity_ratio * sum(part['volume'] for part in parts))}
+    return suitcase, parts
+
+
+def _solve_case(connection, problem, engine):
+    """
+    Child process side of run_solver_case()
+    """
+    suitcase, parts = generate_problem(*problem)
+    solver = KnapSack01Solver(parts, suitcase['volume'])
+    start_memory = peak_memory_kb()
+    start_cpu = cpu_seconds()
+    start = time.time()
+    total_value, indices = solver.solve(engine)
+    result = {"wall_s": time.time() - start, "cpu_s": cpu_seconds() - start_cpu, "value": total_value,
+              "engine_run": solver.engine, "cells": solver.cells, "nodes": solver.nodes}
+    if solver.cpu_utilization is not None:
+        result["cpu_utilization"] = solver.cpu_utilization
+    if resource is not None:
+        result["start_rss_kb"] = start_memory
+        result["peak_rss_kb"] = peak_memory_kb()
+    connection.send(result)
+
+
+def run_solver_case(problem, engine, timeout=DEFAULT_TIMEOUT):
+    """
+    Times KnapSack01Solver.solve(engine) on a generated problem in a child process
+
+    :param problem: generate_problem() arguments
+    :param engine: engine name, or 'auto'
+    :param timeout: seconds the solve may run for
+    :return: dict of wall_s, cpu_s, value, engine_run and peak memory, or of status 'timeout'/'failed'
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_solve_case, args=(sender, problem, engine))
+    process.start()
+    sender.close()
+    if not receiver.poll(timeout):
+        process.terminate()
+        process.join()
+        return {"status": "timeout" if process.exitcode == -15 or process.exitcode is None else "failed"}
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = None
+    process.join()
+    if result is None:
+        return {"status": "failed"}
+    result["status"] = "ok"
+    return result
+
+
+def run_pack_bot_case(problem, engine, directory, timeout=DEFAULT_TIMEOUT):
+    """
+    Times a whole pack_bot.py run, interpreter start-up included, on a generated problem written to
+        local files
+
+    :param problem: generate_problem() arguments
+    :param engine: engine name, or 'auto'
+    :param directory: where the problem files are written
+    :param timeout: seconds the run may take
+    :return: dict of wall_s, cpu_s, value, peak memory and the --stats report of the run, or of status
+        'timeout'/'failed'
+    """
+    suitcase, parts = generate_problem(*problem)
+    suitcase_path = os.path.join(directory, 'suitcase.json')
+    parts_path = os.path.join(directory, 'parts.json')
+    with open(suitcase_path, 'w') as outfile:
+        json.dump(suitcase, outfile)
+    with open(parts_path, 'w') as outfile:
+        json.dump(parts, outfile)
+
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pack_bot.py'),
+               '-e', engine, '--stats', suitcase_path, parts_path]
+    output_path = os.path.join(directory, 'output.json')
+    stats_path = os.path.join(directory, 'stats.json')
+    start = time.time()
+    with open(output_path, 'w') as output, open(stats_path, 'w') as stats:
+        process = subprocess.Popen(command, stdout=output, stderr=stats)
+        usage = None
+        while True:
+            if hasattr(os, 'wait4'):
+                pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    process.returncode = status
+                    break
+            elif process.poll() is not None:
+                break
+            if time.time() - start > timeout:
+                process.kill()
+                process.wait()
+                return {"status": "timeout"}
+            time.sleep(0.005)
+    wall = time.time() - start
+    if process.returncode != 0:
+        return {"status": "failed"}
+    with open(output_path, 'r') as output:
+        result = {"status": "ok", "wall_s": wall, "value": json.load(output)['value']}
+    with open(stats_path, 'r') as stats:
+        # The report is the last thing written; 'auto' writes the engine run before it
+        report = stats.read()
+        result["stats"] = json.loads(report[report.index('{'):])
+    result["cells"] = result["stats"]["cells"]
+    result["nodes"] = result["stats"]["nodes"]
+    if usage is not None:
+        result["cpu_s"] = usage.ru_utime + usage.ru_stime
+        result["peak_rss_kb"] = peak_memory_kb(usage)
+    return result
+
+
+def run_benchmarks(scenarios=SCENARIOS, engines=None, seed=DEFAULT_SEED, repeat=1, timeout=DEFAULT_TIMEOUT,
+                   scale=1.0, end_to_end=True, log=None):
+    """
+    Runs every case of the given scenarios
+
+    :param scenarios: list of SCENARIOS entries
+    :param engines: engines to run (None for every engine listed by each scenario)
+    :param seed: seed of the problem generators
+    :param repeat: runs of each case; the fastest is kept
+    :param timeout: seconds a case may run for
+    :param scale: multiplies the part counts
+    :param end_to_end: also times pack_bot.py runs
+    :param log: optional file each result is echoed to as it completes
+    :return: list of result dicts
+    """
+    results = []
+    # Serial numpy engine result of each scenario, the baseline of its parallel engine case
+    serial_results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        for name, kind, count, max_volume, capacity_ratio, solver_engines, bot_engine in scenarios:
+            problem = (kind, max(1, int(count * scale)), max_volume, capacity_ratio, seed)
+            suitcase, parts = generate_problem(*problem)
+            cases = [('solver', engine) for engine in solver_engines]
+            if end_to_end and bot_engine is not None:
+                cases.append(('pack_bot', bot_engine))
+            for suite, engine in cases:
+                if engines is not None and engine not in engines:
+                    continue
+                if engine in NUMPY_ENGINES and numpy is None:
+                    continue
+                runs = []
+                for run in xrange(repeat):
+                    if suite == 'solver':
+                        runs.append(run_solver_case(problem, engine, timeout))
+                    else:
+                        runs.append(run_pack_bot_case(problem, engine, directory, timeout))
+                    if runs[-1]['status'] != 'ok':
+                        break
+                result = min(runs, key=lambda run: (run['status'] != 'ok', run.get('wall_s')))
+                result.update({"suite": suite, "scenario": name, "kind": kind, "parts": len(parts),
+                               "volume": suitcase['volume'], "engine": engine,
+                               "table_cells": len(parts) * (suitcase['volume'] + 1)})
+                if suite == 'solver' and engine == 'parallel' and result['status'] == 'ok':
+                    serial = serial_results.get(name)
+                    if serial is not None and result['wall_s'] > 0:
+                        result["speedup"] = serial['wall_s'] / result['wall_s']
+                if suite == 'solver' and engine == 'numpy' and result['status'] == 'ok':
+                    serial_results[name] = result
+                results.append(result)
+                if log is not None:
+                    log.write(json.dumps(result, sort_keys=True) + '\n')
+                    log.flush()
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def environment():
+    """
+    Describes where the benchmark ran, including the git commit if there is one
+    """
+    try:
+        commit = subprocess.Popen(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).communicate()[0].strip()
+    except OSError:
+        commit = ''
+    return {"commit": commit or None, "python": platform.python_version(), "platform": platform.platform(),
+            "numpy": numpy.__version__ if numpy is not None else None, "cpus": multiprocessing.cpu_count(),
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare_results(results, baseline, tolerance):
+    """
+    Relates each case's time to the same case in a baseline run
+
+    :param results: list of result dicts
+    :param baseline: list of result dicts from a previous run
+    :param tolerance: relative slowdown allowed
+    :return: list of (case name, baseline wall_s, wall_s, ratio, regressed) for cases in both runs
+    """
+    def key(result):
+        return result['suite'], result['scenario'], result['engine'], result['parts'], result['volume']
+
+    previous = dict((key(result), result) for result in baseline if result['status'] == 'ok')
+    comparisons = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        name = '%s/%s/%s' % key(result)[:3]
+        if result['status'] != 'ok':
+            comparisons.append((name, before['wall_s'], None, None, True))
+            continue
+        ratio = result['wall_s'] / max(before['wall_s'], 1e-9)
+        comparisons.append((name, before['wall_s'], result['wall_s'], ratio, ratio > 1 + tolerance))
+    return comparisons
+
+
+def main():
+    # parse args
+    parser = argparse.ArgumentParser(description="Benchmarks the solver engines and pack_bot.py on synthetic problems")
+    parser.add_argument("-o", "--output", type=str, required=False, default=None,
+                        help="file the json results are written to (defaults to stdout)")
+    parser.add_argument("--seed", type=int, required=False, default=DEFAULT_SEED,
+                        help="seed of the problem generators")
+    parser.add_argument("--repeat", type=int, required=False, default=1,
+                        help="runs of each case; the fastest is kept")
+    parser.add_argument("--timeout", type=float, required=False, default=DEFAULT_TIMEOUT,
+                        help="seconds a case may run for")
+    parser.add_argument("--scale", type=float, required=False, default=1.0,
+                        help="multiplies the part counts of every scenario")
+    parser.add_argument("--scenarios", nargs="+", required=False, default=None,
+                        choices=[scenario[0] for scenario in SCENARIOS], help="only runs these scenarios")
+    parser.add_argument("--engines", nargs="+", required=False, default=None, help="only runs these engines")
+    parser.add_argument("--skip_end_to_end", action="store_true", required=False, default=False,
+                        help="only benchmarks the solver")
+    parser.add_argument("--compare", type=str, required=False, default=None,
+                        help="prints the time of each case relative to a previous results file, exiting with 1 "
+                             "if any is slower by more than TOLERANCE")
+    parser.add_argument("--tolerance", type=float, required=False, default=0.25,
+                        help="relative slowdown allowed by --compare (0.25 is 25%%)")
+    args = parser.parse_args()
+
+    scenarios = [scenario for scenario in SCENARIOS if args.scenarios is None or scenario[0] in args.scenarios]
+    results = run_benchmarks(scenarios, args.engines, args.seed, args.repeat, args.timeout, args.scale,
+                             not args.skip_end_to_end, sys.stderr)
+    report = {"environment": environment(),
+              "settings": {"seed": args.seed, "repeat": args.repeat, "timeout": args.timeout, "scale": args.scale},
+              "results": results}
+    output = json.dumps(report, indent=4, sort_keys=True)
+    if args.output is None:
+        print output
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(output + '\n')
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressed = False
+        for name, before, after, ratio, slower in compare_results(results, baseline, args.tolerance):
+            if after is None:
+                sys.stderr.write('%-45s %10.4fs -> did not finish\n' % (name, before))
+            else:
+                sys.stderr.write('%-45s %10.4fs -> %10.4fs  x%.2f%s\n' % (name, before, after, ratio,
+                                                                         '  REGRESSED' if slower else ''))
+            regressed = regressed or slower
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
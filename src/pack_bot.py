@@ -5,27 +5,121 @@
         Author: Theodore Enns
         Brief: A executable python script that solves 0-1 knapsack.
 
-        usage: pack_bot.py [-h] [-v] [-s] [-r REDUCTION_FACTOR] suitcase_source parts_source
+        usage: pack_bot.py [-h] [-v] [-s] [-r REDUCTION_FACTOR] [-e ENGINE] [-m MEMORY_BUDGET]
+                           [-p] [--epsilon EPSILON] [--deadline_ms DEADLINE_MS]
+                           [-c CACHE_DIR] [--cache_max_age CACHE_MAX_AGE]
+                           [--cache_max_mb CACHE_MAX_MB] [--memo_dir MEMO_DIR] [--stream]
+                           [--stats] [--profile PROFILE] [-t THREADS]
+                           suitcase_source [suitcase_source ...] parts_source
 
-        Returns a json object with an optimal parts list that the robot can pack
+        Returns a json object with an optimal parts list that the robot can pack. Given several
+        suitcases, each part goes in at most one of them and the object also lists the parts and
+        value packed in each suitcase, in a suitcases field.
 
         positional arguments:
-          suitcase_source       the source for the suitcase (file path or http)
+          suitcase_source       the source for the suitcase (file path or http); give several
+                                to pack several suitcases at once
           parts_source          the source for the parts list (file path or http)
 
         optional arguments:
           -h, --help            show this help message and exit
           -v, --verbose         provides a basic breakdown of input and additional output stats
           -s, --save_inputs     saves input files to suitcase.json and parts.json
+                                (deprecated, use --cache_dir to speed up repeated runs)
           -r REDUCTION_FACTOR,
           --reduction_factor REDUCTION_FACTOR
                                 reduces input by division factor (must be int >0)
+          -e ENGINE, --engine ENGINE
+                                the solver engine to use, one of auto, anytime, bits, bnb,
+                                core, dp, fptas, hirschberg, mitm, numpy, parallel, sparse
+                                (numpy and parallel require numpy, auto picks the engine
+                                with the lowest estimated cost and reports it; fptas and
+                                anytime are approximate and add an upper_bound on the
+                                optimal value to the output)
+          -m MEMORY_BUDGET, --memory_budget MEMORY_BUDGET
+                                MB the bits, numpy and parallel engines may use for their
+                                decision table before falling back to the hirschberg engine
+          -p, --preprocess      excludes, fixes and rescales parts before solving
+          --epsilon EPSILON     relative error allowed by the fptas engine (0 < EPSILON < 1)
+          --deadline_ms DEADLINE_MS
+                                milliseconds the anytime engine may search for
+          -c CACHE_DIR, --cache_dir CACHE_DIR
+                                keeps fetched http sources in this directory and
+                                revalidates them with conditional requests
+          --cache_max_age CACHE_MAX_AGE
+                                seconds a cached source is used without revalidating
+          --cache_max_mb CACHE_MAX_MB
+                                MB of cached sources kept before evicting the least
+                                recently used
+          --memo_dir MEMO_DIR   reuses solutions of identical problems stored in this
+                                directory (whatever the part ids; parts must be in the
+                                same order; one suitcase only)
+          --stream              parses the parts list as it arrives into compact arrays
+                                instead of a list of dicts (for very large parts lists)
+          --stats               prints a json report of the wall and CPU time and peak memory
+                                after each phase (fetch, parse, solve, collate, output; fetch
+                                includes parsing with --stream), the bytes fetched and the dp
+                                cells and search nodes evaluated to stderr
+          --profile PROFILE     writes cProfile statistics of the solve phase to this file
+          -t THREADS, --threads THREADS
+                                threads the parallel engine splits each dp row across
+                                (defaults to one per core, for rows long enough); the
+                                CPU utilization reached is shown by --stats and --verbose
 """
 
 import argparse
 import json
-from pb_get_json import grab_dict_from
-from pb_knapsack import KnapSack01Solver
+import sys
+from pb_cache import HttpCache, DEFAULT_MAX_BYTES
+from pb_get_json import grab_dicts_from, fetch_many, set_default_cache, set_fetch_observer
+from pb_memo import SolutionCache
+from pb_multi import MultiKnapSack01Solver
+from pb_parts import compact_parts_from
+from pb_stats import RunStats
+from pb_knapsack import KnapSack01Solver, ENGINES, APPROXIMATE_ENGINES, DEFAULT_MEMORY_BUDGET, DEFAULT_EPSILON
+
+
+def collate_solution(parts, total_value, indices, solver):
+    """
+    Builds the json-ready result printed by pack_bot.py from a solver's answer
+
+    :param parts: the parts list given to the solver
+    :param total_value: total value returned by the solver
+    :param indices: index list returned by the solver
+    :param solver: the KnapSack01Solver that produced the answer
+    :return: dict with part_ids and value fields (and upper_bound for approximate engines)
+    """
+    if len(indices) == 0:
+        result = {"part_ids": None, "value": 0}
+    else:
+        result = {"part_ids": [], "value": total_value}
+        for index in indices:
+            result["part_ids"].append(parts[index]["id"])
+    if solver.engine in APPROXIMATE_ENGINES:
+        result["upper_bound"] = solver.upper_bound
+    return result
+
+
+def collate_multi_solution(parts, total_value, packed, solver):
+    """
+    Builds the json-ready result printed by pack_bot.py for several suitcases: the fields of
+        collate_solution() for every part packed, plus the part_ids and value of each suitcase
+
+    :param parts: the parts list given to the solver
+    :param total_value: total value returned by the solver
+    :param packed: list of index lists returned by the solver, one per suitcase
+    :param solver: the MultiKnapSack01Solver that produced the answer
+    :return: dict with part_ids, value and suitcases fields (and upper_bound if not proven optimal)
+    """
+    result = collate_solution(parts, total_value, sorted(index for indices in packed for index in indices), solver)
+    result["suitcases"] = []
+    for indices in packed:
+        suitcase_value = sum(parts[index]["value"] for index in indices)
+        result["suitcases"].append(collate_solution(parts, suitcase_value, indices, solver))
+        result["suitcases"][-1].pop("upper_bound", None)
+    if solver.upper_bound > total_value:
+        result["upper_bound"] = solver.upper_bound
+    return result
 
 
 def main():
@@ -35,57 +129,137 @@ def main():
     parser.add_argument("-v", "--verbose", action="store_true", required=False, default=False,
                         help="provides a basic breakdown of input and additional output stats")
     parser.add_argument("-s", "--save_inputs", action="store_true", required=False, default=False,
-                        help="saves input files to suitcase.json and parts.json")
+                        help="saves input files to suitcase.json and parts.json "
+                             "(deprecated, use --cache_dir to speed up repeated runs)")
     parser.add_argument("-r", "--reduction_factor", type=int, required=False, default=1,
                         help="reduces input by division factor (must be int >0)")
-    parser.add_argument("suitcase_source", type=str, help="the source for the suitcase (file path or http)")
+    parser.add_argument("-e", "--engine", choices=["auto"] + sorted(ENGINES), required=False, default="dp",
+                        help="the solver engine to use (numpy and parallel require numpy, auto picks the engine "
+                             "with the lowest estimated cost and reports it; fptas and anytime are "
+                             "approximate and add an upper_bound on the optimal value to the output)")
+    parser.add_argument("-m", "--memory_budget", type=int, required=False,
+                        default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help="MB the bits, numpy and parallel engines may use for their decision table before "
+                             "falling back to the hirschberg engine")
+    parser.add_argument("-p", "--preprocess", action="store_true", required=False, default=False,
+                        help="excludes, fixes and rescales parts before solving")
+    parser.add_argument("--epsilon", type=float, required=False, default=DEFAULT_EPSILON,
+                        help="relative error allowed by the fptas engine (0 < EPSILON < 1)")
+    parser.add_argument("--deadline_ms", type=float, required=False, default=None,
+                        help="milliseconds the anytime engine may search for")
+    parser.add_argument("-c", "--cache_dir", type=str, required=False, default=None,
+                        help="keeps fetched http sources in this directory and revalidates them "
+                             "with conditional requests")
+    parser.add_argument("--cache_max_age", type=float, required=False, default=None,
+                        help="seconds a cached source is used without revalidating")
+    parser.add_argument("--cache_max_mb", type=int, required=False, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="MB of cached sources kept before evicting the least recently used")
+    parser.add_argument("--memo_dir", type=str, required=False, default=None,
+                        help="reuses solutions of identical problems stored in this directory "
+                             "(whatever the part ids; parts must be in the same order; one suitcase only)")
+    parser.add_argument("--stream", action="store_true", required=False, default=False,
+                        help="parses the parts list as it arrives into compact arrays instead of a list of dicts "
+                             "(for very large parts lists)")
+    parser.add_argument("--stats", action="store_true", required=False, default=False,
+                        help="prints a json report of the wall and CPU time and peak memory after each phase "
+                             "(fetch, parse, solve, collate, output; fetch includes parsing with --stream), the "
+                             "bytes fetched and the dp cells and search nodes evaluated to stderr")
+    parser.add_argument("--profile", type=str, required=False, default=None,
+                        help="writes cProfile statistics of the solve phase to this file")
+    parser.add_argument("-t", "--threads", type=int, required=False, default=None,
+                        help="threads the parallel engine splits each dp row across (defaults to one per core, "
+                             "for rows long enough); the CPU utilization reached is shown by --stats and --verbose")
+    parser.add_argument("suitcase_source", type=str, nargs="+",
+                        help="the source for the suitcase (file path or http); give several to pack several "
+                             "suitcases at once")
     parser.add_argument("parts_source", type=str, help="the source for the parts list (file path or http)")
     args = parser.parse_args()
 
-    # grab input data
-    suitcase = grab_dict_from(args.suitcase_source)
-    parts = grab_dict_from(args.parts_source)
+    stats = RunStats(['solve'] if args.profile is not None else [])
+    set_fetch_observer(stats.fetched)
+
+    # grab input data, fetching all sources at once
+    if args.cache_dir is not None:
+        set_default_cache(HttpCache(args.cache_dir, args.cache_max_mb * 1024 * 1024, args.cache_max_age))
+    if args.stream:
+        with stats.phase('fetch'):
+            suitcases = grab_dicts_from(args.suitcase_source)
+            parts = compact_parts_from(args.parts_source)
+    else:
+        with stats.phase('fetch'):
+            sources = fetch_many(args.suitcase_source + [args.parts_source])
+        with stats.phase('parse'):
+            sources = [json.loads(data) for data in sources]
+        suitcases, parts = sources[:-1], sources[-1]
     if args.save_inputs:
         with open('suitcase.json', 'w') as outfile:
-            json.dump(suitcase, outfile)
+            json.dump(suitcases[0] if len(suitcases) == 1 else suitcases, outfile)
         with open('parts.json', 'w') as outfile:
-            json.dump(parts, outfile)
+            json.dump(list(parts), outfile)
 
     # Apply data reduction if desired (for testing)
     if args.reduction_factor > 1:
-        suitcase['volume'] = suitcase['volume'] / args.reduction_factor
+        for suitcase in suitcases:
+            suitcase['volume'] = suitcase['volume'] / args.reduction_factor
         parts = parts[0:1 + (len(parts) / args.reduction_factor)]
 
     if args.verbose:
-        print 'Volume: ', suitcase['volume'], ' with #items: ', len(parts)
+        print 'Volume: ', ', '.join(str(suitcase['volume']) for suitcase in suitcases), ' with #items: ', len(parts)
         sum_volume = 0
         for part in parts:
             sum_volume += part['volume']
         print 'Out of total part volume: ', sum_volume
-        print 'Parts: ', parts, '\n'
+        print 'Parts: ', list(parts), '\n'
 
     # Run solver
-    solver = KnapSack01Solver(parts, suitcase['volume'])
-    total_value, indices = solver.pick_items_dp()
+    with stats.phase('solve'):
+        if len(suitcases) > 1:
+            solver = MultiKnapSack01Solver(parts, [suitcase['volume'] for suitcase in suitcases],
+                                           memory_budget=args.memory_budget * 1024 * 1024, epsilon=args.epsilon,
+                                           deadline_ms=args.deadline_ms, threads=args.threads)
+            total_value, packed = solver.pick_items_multi(args.engine, args.preprocess)
+            indices = sorted(index for suitcase_indices in packed for index in suitcase_indices)
+        else:
+            solver = KnapSack01Solver(parts, suitcases[0]['volume'], memory_budget=args.memory_budget * 1024 * 1024,
+                                      epsilon=args.epsilon, deadline_ms=args.deadline_ms, threads=args.threads)
+            if args.memo_dir is not None:
+                total_value, indices = SolutionCache(directory=args.memo_dir).solve(solver, args.engine,
+                                                                                    args.preprocess)
+            else:
+                total_value, indices = solver.solve(args.engine, reduce=args.preprocess)
+    stats.record_solver(solver)
+    if args.engine == 'auto':
+        sys.stderr.write('Engine: %s\n' % solver.engine)
     if args.verbose:
+        print 'Engine: ', solver.engine
+        if solver.reduction is not None:
+            print 'Preprocessing: ', len(solver.reduction.excluded), ' parts excluded, ', \
+                len(solver.reduction.forced), ' fixed, volume scaled down by ', solver.reduction.scale
+            print 'DP cells before and after: ', solver.reduction.cells()
         print 'Total Value: ', total_value
+        print 'Upper Bound: ', solver.upper_bound
+        if solver.cpu_utilization is not None:
+            print 'CPU Utilization: ', solver.cpu_utilization
         print 'Indices: ', indices
 
     # Collate solution
-    sum_volume = 0
-    if len(indices) == 0:
-        result = {"part_ids": None, "value": 0}
-    else:
-        result = {"part_ids": [], "value": total_value}
-        for index in indices:
-            result["part_ids"].append(parts[index]["id"])
-            sum_volume += parts[index]['volume']
+    with stats.phase('collate'):
+        if len(suitcases) > 1:
+            result = collate_multi_solution(parts, total_value, packed, solver)
+        else:
+            result = collate_solution(parts, total_value, indices, solver)
     if args.verbose:
-        print 'Used volume: ', sum_volume, '\n'
-    output = json.dumps(result, indent=4)
+        print 'Used volume: ', sum(parts[index]['volume'] for index in indices), '\n'
 
     # Output final result
-    print output
+    with stats.phase('output'):
+        output = json.dumps(result, indent=4)
+        print output
+        sys.stdout.flush()
+    if args.profile is not None:
+        stats.dump_profile(args.profile)
+    if args.stats:
+        sys.stderr.write(json.dumps(stats.report(), indent=4, sort_keys=True) + '\n')
     return 0
 
 
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+
+"""
+    pack_service.py
+        Author: Theodore Enns
+        Brief: A long-running service answering pack_bot.py requests over local http.
+
+        usage: pack_service.py [-h] [--host HOST] [--port PORT] [-v] [-w WORKERS] [-q MAX_QUEUE]
+                               [-e ENGINE] [-m MEMORY_BUDGET] [-p] [--epsilon EPSILON]
+                               [--deadline_ms DEADLINE_MS] [--fetch_timeout FETCH_TIMEOUT]
+                               [--fetch_retries FETCH_RETRIES] [-c CACHE_DIR]
+                               [--cache_max_age CACHE_MAX_AGE] [--cache_max_mb CACHE_MAX_MB]
+                               [--memo_entries MEMO_ENTRIES] [--memo_dir MEMO_DIR]
+
+        Interpreter start-up, imports and a cold connection pool are paid once rather than per
+        robot. Sources are fetched by the request threads through one keep-alive connection pool
+        (and the on-disk cache if given), solutions are looked up in one solution cache shared by
+        every request, and misses are solved by a pool of warm worker processes.
+
+        Any client that can reach the service chooses which sources it reads. Bound to a loopback
+        address that is only local users, but with --host set to any other address only http and
+        https sources are accepted, so remote clients can not have local files read. They can still
+        have the service fetch any url it can reach itself, so keep it behind a firewall.
+
+        POST /solve {"suitcase_source": ..., "parts_source": ...}
+            answers 200 with exactly the json pack_bot.py prints for the pair, 400 for a malformed
+            request, 403 for a file source on a non-loopback address, 502 if a source could not be
+            fetched or read, and 503 (with Retry-After) when MAX_QUEUE requests are already being
+            served
+        GET /status
+            answers 200 with a json object of request, queue and cache counters
+
+        optional arguments:
+          -h, --help            show this help message and exit
+          --host HOST           address to listen on (defaults to 127.0.0.1, local only;
+                                any other address only accepts http and https sources)
+          --port PORT           port to listen on
+          -v, --verbose         logs every request to stderr
+          -w WORKERS, --workers WORKERS
+                                number of worker processes (defaults to the cpu count; 0
+                                solves in the request threads)
+          -q MAX_QUEUE, --max_queue MAX_QUEUE
+                                requests served or waiting at once before answering 503
+          -e ENGINE, -m MEMORY_BUDGET, -p, --epsilon EPSILON, --deadline_ms DEADLINE_MS
+                                solver options (see pack_bot.py)
+          --fetch_timeout FETCH_TIMEOUT, --fetch_retries FETCH_RETRIES
+                                fetch options (see pack_batch.py)
+          -c CACHE_DIR, --cache_dir CACHE_DIR, --cache_max_age CACHE_MAX_AGE,
+          --cache_max_mb CACHE_MAX_MB
+                                on-disk http cache (see pack_bot.py)
+          --memo_entries MEMO_ENTRIES
+                                solutions kept in memory for identical problems
+          --memo_dir MEMO_DIR   on-disk solution store backing the in-memory one
+"""
+
+import argparse
+import json
+import multiprocessing
+import socket
+import sys
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from pack_bot import collate_solution
+from pb_cache import HttpCache, DEFAULT_MAX_BYTES
+from pb_get_json import ConnectionPool, set_default_pool, set_default_cache, grab_dicts_from
+from pb_get_json import DEFAULT_TIMEOUT, DEFAULT_RETRIES
+from pb_knapsack import KnapSack01Solver, ENGINES, APPROXIMATE_ENGINES, DEFAULT_MEMORY_BUDGET, DEFAULT_EPSILON
+from pb_memo import SolutionCache, DEFAULT_MAX_ENTRIES
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 64
+
+
+class ServiceBusy(Exception):
+    """
+    Raised when a request arrives while the queue is full
+    """
+    pass
+
+
+class SourceRejected(Exception):
+    """
+    Raised when a request names a source the service will not read
+    """
+    pass
+
+
+def is_loopback(host):
+    """
+    Whether host only accepts connections from this machine
+
+    :param host: address or host name to listen on
+    :return: True for loopback addresses, False otherwise (including the wildcard '' and 0.0.0.0)
+    """
+    try:
+        address = socket.getaddrinfo(host or None, None, 0, socket.SOCK_STREAM, 0, socket.AI_PASSIVE)[0][4][0]
+    except socket.error:
+        return False
+    return address.startswith('127.') or address == '::1'
+
+
+def solve_problem(parts, volume, engine, reduce, memory_budget, epsilon, deadline_ms):
+    """
+    Solves one problem in a worker process
+
+    :return: total_value, index_list, engine used, upper_bound
+    """
+    solver = KnapSack01Solver(parts, volume, memory_budget=memory_budget, epsilon=epsilon, deadline_ms=deadline_ms)
+    total_value, indices = solver.solve(engine, reduce)
+    return total_value, indices, solver.engine, solver.upper_bound
+
+
+class PackService(object):
+    def __init__(self, workers=None, max_queue=DEFAULT_MAX_QUEUE, engine='dp', reduce=False,
+                 memory_budget=DEFAULT_MEMORY_BUDGET, epsilon=DEFAULT_EPSILON, deadline_ms=None,
+                 memo=None, http_only=False):
+        """
+        Solves pack_bot.py requests with warm workers and shared caches. Fetching goes through the
+            process-wide connection pool and cache (see pb_get_json.set_default_pool()).
+
+        :param workers: number of worker processes, None for the cpu count, 0 to solve in the caller
+        :param max_queue: requests served or waiting at once before solve() raises ServiceBusy
+        :param engine: the solver engine to use (see KnapSack01Solver.solve)
+        :param reduce: whether to preprocess before solving
+        :param memory_budget: see KnapSack01Solver
+        :param epsilon: see KnapSack01Solver
+        :param deadline_ms: see KnapSack01Solver
+        :param memo: SolutionCache shared by every request, or None for a memory only one
+        :param http_only: whether solve() refuses sources other than http and https urls
+        """
+        self.engine = engine
+        self.reduce = reduce
+        self.memory_budget = memory_budget
+        self.epsilon = epsilon
+        self.deadline_ms = deadline_ms
+        self.memo = memo if memo is not None else SolutionCache()
+        self.max_queue = max_queue
+        self.http_only = http_only
+        self.served = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._pool = multiprocessing.Pool(workers) if workers != 0 else None
+
+    def solve(self, suitcase_source, parts_source):
+        """
+        Fetches and solves one (suitcase, parts) pair
+
+        :param suitcase_source: the source for the suitcase (file path or http)
+        :param parts_source: the source for the parts list (file path or http)
+        :return: the result dict pack_bot.py would print
+        """
+        if self.http_only:
+            for source in (suitcase_source, parts_source):
+                if not (source.startswith("http://") or source.startswith("https://")):
+                    raise SourceRejected("only http and https sources are accepted, not %s" % source)
+        with self._lock:
+            if self.in_flight >= self.max_queue:
+                self.rejected += 1
+                raise ServiceBusy("%d requests already queued" % self.in_flight)
+            self.in_flight += 1
+        try:
+            suitcase, parts = grab_dicts_from([suitcase_source, parts_source])
+            return self._solve(suitcase, parts)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.served += 1
+
+    def _solve(self, suitcase, parts):
+        solver = KnapSack01Solver(parts, suitcase['volume'], memory_budget=self.memory_budget,
+                                  epsilon=self.epsilon, deadline_ms=self.deadline_ms)
+        memoize = self.engine not in APPROXIMATE_ENGINES
+        solution = self.memo.lookup(solver) if memoize else None
+        if solution is None:
+            arguments = (parts, suitcase['volume'], self.engine, self.reduce, self.memory_budget, self.epsilon,
+                         self.deadline_ms)
+            if self._pool is None:
+                answer = solve_problem(*arguments)
+            else:
+                answer = self._pool.apply_async(solve_problem, arguments).get()
+            total_value, indices, solver.engine, solver.upper_bound = answer
+            if memoize:
+                self.memo.store(solver, total_value, indices)
+            solution = total_value, indices
+        return collate_solution(parts, solution[0], solution[1], solver)
+
+    def status(self):
+        """
+        :return: dict of request, queue and cache counters
+        """
+        return {"served": self.served, "rejected": self.rejected, "in_flight": self.in_flight,
+                "max_queue": self.max_queue, "memo_hits": self.memo.hits, "memo_misses": self.memo.misses}
+
+    def close(self):
+        """
+        Stops the worker processes
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+
+
+class PackServiceHandler(BaseHTTPRequestHandler):
+    """
+    Http front end of the PackService in self.server.service, over keep-alive http/1.1
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path != '/status':
+            return self._respond(404, {"error": "unknown path %s" % self.path})
+        self._respond(200, self.server.service.status())
+
+    def do_POST(self):
+        if self.path != '/solve':
+            return self._respond(404, {"error": "unknown path %s" % self.path})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            sources = request['suitcase_source'], request['parts_source']
+            if not all(isinstance(source, basestring) for source in sources):
+                raise TypeError("sources must be strings")
+        except (ValueError, TypeError, KeyError) as error:
+            return self._respond(400, {"error": "expected a json object with suitcase_source and parts_source "
+                                                "fields (%s)" % error})
+        try:
+            result = self.server.service.solve(*sources)
+        except ServiceBusy as error:
+            return self._respond(503, {"error": str(error)}, {'Retry-After': '1'})
+        except SourceRejected as error:
+            return self._respond(403, {"error": str(error)})
+        except Exception as error:
+            return self._respond(502, {"error": str(error)})
+        self._respond(200, result)
+
+    def _respond(self, status, result, headers=None):
+        # Same formatting as pack_bot.py's output, print's newline included
+        body = json.dumps(result, indent=4) + '\n'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, *args)
+
+
+class PackServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service, host='127.0.0.1', port=DEFAULT_PORT, verbose=False):
+        """
+        Threaded http server answering requests with service
+
+        :param service: PackService
+        :param host: address to listen on
+        :param port: port to listen on, 0 for any free port
+        :param verbose: logs every request to stderr
+        """
+        HTTPServer.__init__(self, (host, port), PackServiceHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def main():
+    # parse args
+    parser = argparse.ArgumentParser(description="Answers pack_bot.py requests over local http with warm workers")
+    parser.add_argument("--host", type=str, required=False, default='127.0.0.1',
+                        help="address to listen on (defaults to 127.0.0.1, local only; any other address only "
+                             "accepts http and https sources)")
+    parser.add_argument("--port", type=int, required=False, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("-v", "--verbose", action="store_true", required=False, default=False,
+                        help="logs every request to stderr")
+    parser.add_argument("-w", "--workers", type=int, required=False, default=None,
+                        help="number of worker processes (defaults to the cpu count; 0 solves in the request threads)")
+    parser.add_argument("-q", "--max_queue", type=int, required=False, default=DEFAULT_MAX_QUEUE,
+                        help="requests served or waiting at once before answering 503")
+    parser.add_argument("-e", "--engine", choices=["auto"] + sorted(ENGINES), required=False, default="dp",
+                        help="the solver engine to use (see pack_bot.py)")
+    parser.add_argument("-m", "--memory_budget", type=int, required=False,
+                        default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help="MB the bits, numpy and parallel engines may use for their decision table")
+    parser.add_argument("-p", "--preprocess", action="store_true", required=False, default=False,
+                        help="excludes, fixes and rescales parts before solving")
+    parser.add_argument("--epsilon", type=float, required=False, default=DEFAULT_EPSILON,
+                        help="relative error allowed by the fptas engine (0 < EPSILON < 1)")
+    parser.add_argument("--deadline_ms", type=float, required=False, default=None,
+                        help="milliseconds the anytime engine may search for")
+    parser.add_argument("--fetch_timeout", type=float, required=False, default=DEFAULT_TIMEOUT,
+                        help="seconds before a fetch times out")
+    parser.add_argument("--fetch_retries", type=int, required=False, default=DEFAULT_RETRIES,
+                        help="times a failed fetch is retried, with exponential backoff")
+    parser.add_argument("-c", "--cache_dir", type=str, required=False, default=None,
+                        help="keeps fetched http sources in this directory (see pack_bot.py)")
+    parser.add_argument("--cache_max_age", type=float, required=False, default=None,
+                        help="seconds a cached source is used without revalidating")
+    parser.add_argument("--cache_max_mb", type=int, required=False, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="MB of cached sources kept before evicting the least recently used")
+    parser.add_argument("--memo_entries", type=int, required=False, default=DEFAULT_MAX_ENTRIES,
+                        help="solutions kept in memory for identical problems")
+    parser.add_argument("--memo_dir", type=str, required=False, default=None,
+                        help="on-disk solution store backing the in-memory one")
+    args = parser.parse_args()
+
+    set_default_pool(ConnectionPool(timeout=args.fetch_timeout, retries=args.fetch_retries))
+    if args.cache_dir is not None:
+        set_default_cache(HttpCache(args.cache_dir, args.cache_max_mb * 1024 * 1024, args.cache_max_age))
+    service = PackService(args.workers, args.max_queue, args.engine, args.preprocess,
+                          args.memory_budget * 1024 * 1024, args.epsilon, args.deadline_ms,
+                          SolutionCache(args.memo_entries, args.memo_dir), not is_loopback(args.host))
+    server = PackServer(service, args.host, args.port, args.verbose)
+    sys.stderr.write('Listening on http://%s:%d\n' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+    pb_cache.py
+        Author: Theodore Enns
+        Brief: A persistent on-disk cache for json fetched over http.
+
+           Robots share suitcase definitions and parts lists rarely change, so bodies are kept
+           under a cache directory along with their ETag and Last-Modified validators. A cached
+           entry younger than max_age is served without touching the network; older entries are
+           revalidated with a conditional GET and only downloaded again if they changed. Entries
+           are evicted least recently used first once the cache grows past max_bytes. Files are
+           written to a temporary name and renamed into place so several processes can share a
+           cache directory.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class HttpCache(object):
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, max_age=None):
+        """
+        On-disk http cache with validator based revalidation and size based LRU eviction
+
+        :param directory: path of the cache directory (created if missing)
+        :param max_bytes: total size of cached bodies to keep
+        :param max_age: seconds an entry is used without revalidating, or None to always revalidate
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def fetch(self, url, pool):
+        """
+        Grabs the body of url from the cache, revalidating or downloading it through pool as needed
+
+        :param url: string http url
+        :param pool: pb_get_json.ConnectionPool to fetch through
+        :return: body string
+        """
+        body_path, meta_path = self._paths(url)
+        meta = self._load_meta(meta_path)
+        if meta is not None and self.max_age is not None and time.time() - meta['fetched_at'] <= self.max_age:
+            body = self._read(body_path)
+            if body is not None:
+                self.hits += 1
+                self._touch(meta_path)
+                return body
+
+        headers = {}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        response, body = pool.fetch(url, headers)
+
+        if response.status == 304 and meta is not None:
+            body = self._read(body_path)
+            if body is not None:
+                self.revalidated += 1
+                meta['fetched_at'] = time.time()
+                self._write(meta_path, json.dumps(meta))
+                return body
+            # The body went missing under us; fetch it again unconditionally
+            response, body = pool.fetch(url)
+        if response.status != 200:
+            raise Exception(["HTTP error %d for source path: " % response.status, url])
+
+        self.misses += 1
+        self._write(body_path, body)
+        self._write(meta_path, json.dumps({'url': url, 'etag': response.getheader('etag'),
+                                           'last_modified': response.getheader('last-modified'),
+                                           'fetched_at': time.time(), 'size': len(body)}))
+        self._evict()
+        return body
+
+    def size(self):
+        """
+        Total size in bytes of the bodies in the cache
+        """
+        return sum(meta['size'] for meta_path, meta in self._entries())
+
+    def _paths(self, url):
+        key = hashlib.sha1(url).hexdigest()
+        return os.path.join(self.directory, key + '.body'), os.path.join(self.directory, key + '.meta')
+
+    def _entries(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.meta'):
+                meta_path = os.path.join(self.directory, name)
+                meta = self._load_meta(meta_path)
+                if meta is not None:
+                    yield meta_path, meta
+
+    def _evict(self):
+        """
+        Removes least recently used entries (by meta file mtime) until the cache fits in max_bytes
+        """
+        entries = []
+        for meta_path, meta in self._entries():
+            try:
+                entries.append((os.path.getmtime(meta_path), meta_path, meta['size']))
+            except OSError:
+                pass  # Evicted by another process
+        total = sum(size for used_at, meta_path, size in entries)
+        for used_at, meta_path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in (meta_path, meta_path[:-len('.meta')] + '.body'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+    def _load_meta(self, meta_path):
+        data = self._read(meta_path)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as cache_file:
+                return cache_file.read()
+        except IOError:
+            return None
+
+    def _write(self, path, data):
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as cache_file:
+            cache_file.write(data)
+        os.rename(temporary_path, path)
+
+    def _touch(self, path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
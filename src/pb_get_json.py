@@ -3,25 +3,278 @@
         Author: Theodore Enns
         Brief: A few helper functions for getting json data
             for the pack bot assignment.
+
+           Fetch latency came to dominate short runs, so http sources go through a ConnectionPool
+           that keeps idle keep-alive connections per host for reuse, retries connection failures
+           and 5xx answers with exponential backoff, and fetch_many() fetches a list of sources
+           over a thread pool. Once set_default_cache() is given a pb_cache.HttpCache, http
+           fetches are served from and revalidated against it. As urllib2 did, redirects are
+           followed (up to MAX_REDIRECTS hops) and the http_proxy, https_proxy and no_proxy
+           environment variables are honoured: http urls are requested through the proxy, https
+           urls are tunnelled through it with CONNECT.
+
+           Parts lists can be tens of MB, so stream_json_from() hands a source over in chunks as it
+           arrives and iter_json_array() decodes the elements of a json array one at a time from
+           such chunks, never holding the whole document or the whole decoded list.
+
+           A fetch observer set with set_fetch_observer() is told the size of every source read
+           (each chunk, when streaming), e.g. pb_stats.RunStats.fetched to count bytes fetched.
 """
 import os
-import urllib2
+import httplib
 import json
+import socket
+import threading
+import time
+import urllib
+import urlparse
+from multiprocessing.pool import ThreadPool
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+DEFAULT_CONCURRENCY = 8
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class ConnectionPool(object):
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, max_idle=4,
+                 proxies=None):
+        """
+        Thread-safe pool of keep-alive http connections, keyed by scheme, host and port
+
+        :param timeout: seconds to wait on connecting or reading before giving up
+        :param retries: times a failed fetch is retried (connection errors and 5xx status only)
+        :param backoff: seconds to sleep before the first retry, doubling for each retry after
+        :param max_idle: idle connections kept per host
+        :param proxies: dict of url scheme to proxy url, None to read them from the environment
+            (hosts in no_proxy are then reached directly) or {} to never use a proxy
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_idle = max_idle
+        self.proxies = urllib.getproxies() if proxies is None else proxies
+        self.connections_opened = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, url, headers=None):
+        """
+        Grabs the body of url, reusing an idle connection to its host when there is one and
+            following redirects
+
+        :param url: string http or https url
+        :param headers: optional dict of extra request headers
+        :return: response, body (the response has been read in full)
+        """
+        for hop in range(MAX_REDIRECTS + 1):
+            response, body = self._fetch_once(url, headers)
+            location = response.getheader('location')
+            if response.status not in REDIRECT_STATUSES or not location:
+                return response, body
+            url = urlparse.urljoin(url, location)
+        raise Exception(["Too many redirects for source path: ", url])
+
+    def _fetch_once(self, url, headers):
+        key, path = self._route(url)
+        request_headers = {'Accept': 'application/json'}
+        request_headers.update(headers or {})
+
+        attempt = 0
+        while True:
+            connection, reused = self._acquire(key)
+            try:
+                connection.request('GET', path, headers=request_headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (httplib.HTTPException, socket.error) as error:
+                connection.close()
+                if reused:
+                    continue  # The server dropped an idle connection; that is not worth a retry
+                failure = error
+            else:
+                if response.will_close:
+                    connection.close()
+                else:
+                    self._release(key, connection)
+                if response.status < 500:
+                    return response, body
+                failure = Exception(["Server error %d for source path: " % response.status, url])
+            if attempt >= self.retries:
+                raise failure
+            time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    def stream(self, url, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Yields the body of url in chunks as they arrive, following redirects. Failures are retried
+            as in fetch() until the first chunk has been handed over; the connection goes back to the pool once the body
+            has been read in full.
+
+        :param url: string http or https url
+        :param chunk_size: bytes read at a time
+        :return: generator of body strings
+        """
+        key, path = self._route(url)
+        hops = 0
+        attempt = 0
+        while True:
+            connection, reused = self._acquire(key)
+            try:
+                connection.request('GET', path, headers={'Accept': 'application/json'})
+                response = connection.getresponse()
+                if response.status == 200:
+                    break
+                response.read()
+            except (httplib.HTTPException, socket.error) as error:
+                connection.close()
+                if reused:
+                    continue  # The server dropped an idle connection; that is not worth a retry
+                failure = error
+            else:
+                location = response.getheader('location')
+                if response.status in REDIRECT_STATUSES and location and hops < MAX_REDIRECTS:
+                    if response.will_close:
+                        connection.close()
+                    else:
+                        self._release(key, connection)
+                    url = urlparse.urljoin(url, location)
+                    key, path = self._route(url)
+                    hops += 1
+                    continue
+                connection.close()
+                failure = Exception(["HTTP error %d for source path: " % response.status, url])
+                if response.status < 500:
+                    raise failure
+            if attempt >= self.retries:
+                raise failure
+            time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+        try:
+            chunk = response.read(chunk_size)
+            while chunk:
+                yield chunk
+                chunk = response.read(chunk_size)
+        except BaseException:
+            # Includes the caller abandoning the body part way (GeneratorExit)
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(key, connection)
+
+    def close(self):
+        """
+        Closes every idle connection
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+            self.connections_opened += 1
+        scheme, host, port, tunnel = key
+        if tunnel is not None:
+            connection = httplib.HTTPSConnection(host, port, timeout=self.timeout)
+            connection.set_tunnel(*tunnel)
+            return connection, False
+        connection_class = httplib.HTTPSConnection if scheme == 'https' else httplib.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def _route(self, url):
+        """
+        Works out where to connect for url: straight to its host, or to the proxy for its scheme
+
+        :param url: string http or https url
+        :return: pool key (scheme, host, port, and the host and port tunnelled to through an https
+            proxy or None), path to request
+        """
+        split_url = urlparse.urlsplit(url)
+        path = split_url.path or '/'
+        if split_url.query:
+            path += '?' + split_url.query
+        proxy = self.proxies.get(split_url.scheme)
+        if not proxy or urllib.proxy_bypass(split_url.netloc):
+            return (split_url.scheme, split_url.hostname, split_url.port, None), path
+        split_proxy = urlparse.urlsplit(proxy if '://' in proxy else 'http://' + proxy)
+        if split_url.scheme == 'https':
+            return ('http', split_proxy.hostname, split_proxy.port, (split_url.hostname, split_url.port or 443)), path
+        return ('http', split_proxy.hostname, split_proxy.port, None), url  # A proxy is asked for the whole url
+
+    def _release(self, key, connection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+        connection.close()
+
+
+# Pool shared by every fetch in this process unless one is passed in
+_default_pool = ConnectionPool()
+
+# Optional pb_cache.HttpCache every http fetch in this process goes through
+_default_cache = None
+
+# Optional callable(source, byte_count) told of every source read in this process
+_fetch_observer = None
+
+
+def set_default_pool(pool):
+    """
+    Replaces the connection pool used when none is passed in, e.g. to change timeouts or retries
+
+    :param pool: ConnectionPool
+    """
+    global _default_pool
+    _default_pool = pool
+
+
+def set_default_cache(cache):
+    """
+    Sets the on-disk cache http fetches go through, or None to always download
+
+    :param cache: pb_cache.HttpCache or None
+    """
+    global _default_cache
+    _default_cache = cache
+
+
+def set_fetch_observer(observer):
+    """
+    Sets the callable told of every source read, or None to stop observing. It is called with the
+        source and the byte count read, from whichever thread did the fetching.
+
+    :param observer: callable(source, byte_count) or None
+    """
+    global _fetch_observer
+    _fetch_observer = observer
 
 
-def http_fetch_json(http_path):
+def http_fetch_json(http_path, pool=None):
     """
     Grabs json string from URL
     :param http_path: string path of http fetch
+    :param pool: ConnectionPool to fetch through (defaults to the shared pool)
     :return: None if fetch fails and a serialized json string otherwise
     """
-    director = urllib2.build_opener()
-    req = urllib2.Request(http_path, headers={'Accept': 'application/json'})
-    result = director.open(req)
-    if result is not None:
-        return result.read()
-    else:
-        return None
+    if _default_cache is not None:
+        return _default_cache.fetch(http_path, pool or _default_pool)
+    response, body = (pool or _default_pool).fetch(http_path)
+    if response.status != 200:
+        raise Exception(["HTTP error %d for source path: " % response.status, http_path])
+    return body
 
 
 def file_fetch_json(file_path):
@@ -41,17 +294,143 @@ def file_fetch_json(file_path):
         return None
 
 
-def grab_dict_from(source):
+def fetch_json_from(source, pool=None):
     """
-    Gets deserialized dict from json source (file path loading for debug purposes)
+    Gets the serialized json string from a source (file path loading for debug purposes)
     :param source: string path of file or http path for file
-    :return: a dictionary with deserialized contents from source
+    :param pool: ConnectionPool to fetch http sources through (defaults to the shared pool)
+    :return: serialized json string
     """
-    if source.startswith("http://"):
-        data = http_fetch_json(source)
+    if source.startswith("http://") or source.startswith("https://"):
+        data = http_fetch_json(source, pool)
     else:
         data = file_fetch_json(source)
     if data is None:
         raise Exception(["Failed to open source path: ", source])
-    result = json.loads(data)
-    return result
+    if _fetch_observer is not None:
+        _fetch_observer(source, len(data))
+    return data
+
+
+def stream_json_from(source, pool=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Gets the serialized json string of a source in chunks, reading it as it arrives (http sources
+        held in the default cache are read whole from it)
+    :param source: string path of file or http path for file
+    :param pool: ConnectionPool to fetch http sources through (defaults to the shared pool)
+    :param chunk_size: bytes read at a time
+    :return: generator of string chunks
+    """
+    for chunk in _stream_chunks(source, pool, chunk_size):
+        if _fetch_observer is not None:
+            _fetch_observer(source, len(chunk))
+        yield chunk
+
+
+def _stream_chunks(source, pool, chunk_size):
+    if source.startswith("http://") or source.startswith("https://"):
+        if _default_cache is not None:
+            yield _default_cache.fetch(source, pool or _default_pool)
+            return
+        for chunk in (pool or _default_pool).stream(source, chunk_size):
+            yield chunk
+        return
+    if not os.path.isfile(source):
+        raise Exception(["Failed to open source path: ", source])
+    with open(source, "r") as json_file:
+        chunk = json_file.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = json_file.read(chunk_size)
+
+
+def iter_json_array(chunks):
+    """
+    Decodes the elements of a json array one at a time from a stream of chunks
+    :param chunks: iterable of strings that concatenate to a json array
+    :return: generator of the deserialized elements, in order
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ''
+    position = 0
+    expected = '['
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+        if position < len(buffer):
+            char = buffer[position]
+            if expected == '[' or expected == ',]':
+                if char not in expected:
+                    raise ValueError("Expected one of %s at %r" % (expected, buffer[position:position + 20]))
+                position += 1
+                if char == ']':
+                    return
+                expected = 'value]' if char == '[' else 'value'
+                continue
+            if char == ']' and expected == 'value]':
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                end = None  # The element may run on into the next chunk
+            # A number may run on into the next chunk too ("-3" of "-3.5"), so an element only counts
+            #   once what follows it is in the buffer
+            if end is not None and end < len(buffer) and buffer[end] in ' \t\r\n,]':
+                yield element
+                position = end
+                expected = ',]'
+                continue
+        chunk = next(chunks, None)
+        if chunk is None:
+            if expected.startswith('value') and position < len(buffer):
+                decoder.raw_decode(buffer, position)  # Reports what is wrong with the last element
+            raise ValueError("Unterminated json array")
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def fetch_many(sources, concurrency=DEFAULT_CONCURRENCY, pool=None, return_errors=False):
+    """
+    Gets the serialized json strings of several sources, fetching up to concurrency at once
+    :param sources: list of string paths of files or http paths
+    :param concurrency: maximum number of fetches in flight
+    :param pool: ConnectionPool to fetch http sources through (defaults to the shared pool)
+    :param return_errors: put the exception of a failed fetch in its place instead of raising it
+    :return: list of serialized json strings, in the order of sources
+    """
+    def fetch(source):
+        try:
+            return fetch_json_from(source, pool)
+        except Exception as error:
+            if not return_errors:
+                raise
+            return error
+
+    if concurrency <= 1 or len(sources) <= 1:
+        return [fetch(source) for source in sources]
+    threads = ThreadPool(min(concurrency, len(sources)))
+    try:
+        return threads.map(fetch, sources)
+    finally:
+        threads.close()
+        threads.join()
+
+
+def grab_dict_from(source):
+    """
+    Gets deserialized dict from json source (file path loading for debug purposes)
+    :param source: string path of file or http path for file
+    :return: a dictionary with deserialized contents from source
+    """
+    return json.loads(fetch_json_from(source))
+
+
+def grab_dicts_from(sources, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Gets deserialized dicts from several json sources, fetching them concurrently
+    :param sources: list of string paths of files or http paths
+    :param concurrency: maximum number of fetches in flight
+    :return: list of dictionaries, in the order of sources
+    """
+    return [json.loads(data) for data in fetch_many(sources, concurrency)]
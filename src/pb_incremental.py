@@ -0,0 +1,127 @@
+"""
+    pb_incremental.py
+        Author: Theodore Enns
+        Brief: A stateful knapsack 0-1 solver that is updated rather than rerun.
+
+           Parts lists tend to change by a few items between runs and suitcases come in close
+           sizes, so IncrementalKnapSack01Solver keeps its dp state around: the packed decision
+           table (one keep bit per part and capacity, as in pick_items_dp_bits), the last value row,
+           and a checkpoint of the value row every checkpoint_interval parts. Appending parts only
+           computes the new rows. The last row holds the best value for every capacity up to the
+           suitcase volume, so a smaller capacity is answered in O(1) (its packing in O(n) by
+           backtracking from that column), exactly as a fresh pick_items_dp() at that capacity
+           would. Removing a part recomputes the rows from the nearest checkpoint before it, which
+           is as little as can be done, since every later row depends on the removed one.
+"""
+
+from pb_knapsack import KnapSack01Solver, decision_row_bytes
+from pb_parts import part_columns
+
+DEFAULT_CHECKPOINT_INTERVAL = 16
+
+
+class IncrementalKnapSack01Solver(KnapSack01Solver):
+    def __init__(self, parts, volume, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, **solver_options):
+        """
+        Knapsack 0-1 solver keeping its decision table, last value row and value row checkpoints
+            between updates. Holds n * (volume + 8) / 8 bytes of decisions plus
+            n / checkpoint_interval value rows.
+
+        :param parts: list of parts where each parts is a dict of id, volume, and value fields
+        :param volume: positive integer for the largest capacity that will be queried
+        :param checkpoint_interval: parts between value row checkpoints
+        :param solver_options: passed on to KnapSack01Solver
+        """
+        KnapSack01Solver.__init__(self, list(parts), volume, **solver_options)
+        self.checkpoint_interval = checkpoint_interval
+        self.rows_computed = 0
+        self._rebuild(volume)
+
+    def add_parts(self, parts):
+        """
+        Appends parts, computing only their rows of the table
+
+        :param parts: list of parts to append
+        """
+        start = self.num_options
+        volumes, values = part_columns(parts)
+        self.parts.extend(parts)
+        self.volumes.extend(volumes)
+        self.values.extend(values)
+        self.num_options = len(self.parts)
+        self._extend(start, self._value_list)
+
+    def remove_part(self, index):
+        """
+        Removes the part at index, recomputing the rows after the nearest checkpoint at or before it.
+            Later parts move down one index.
+
+        :param index: index of the part to remove
+        """
+        del self.parts[index]
+        del self.volumes[index]
+        del self.values[index]
+        self.num_options = len(self.parts)
+        checkpoint = index // self.checkpoint_interval
+        del self._checkpoints[checkpoint + 1:]
+        row_bytes = decision_row_bytes(self.max_volume)
+        del self._decisions[index * row_bytes:]
+        value_list = self._advance_values(list(self._checkpoints[checkpoint]),
+                                          checkpoint * self.checkpoint_interval, index)
+        self.rows_computed += index - checkpoint * self.checkpoint_interval
+        self._extend(index, value_list)
+
+    def value(self, volume=None):
+        """
+        Best total value packable in capacity volume, in O(1)
+
+        :param volume: capacity up to self.max_volume, or None for self.max_volume
+        :return: total_value
+        """
+        if volume is None:
+            volume = self.max_volume
+        if volume > self.max_volume:
+            self._rebuild(volume)
+        return self._value_list[volume]
+
+    def pick_items(self, volume=None):
+        """
+        Returns what pick_items_dp() would for capacity volume, by backtracking the kept table.
+            A capacity above self.max_volume rebuilds the table for it.
+
+        :param volume: capacity, or None for self.max_volume
+        :return: total_value, index_list
+        """
+        total_value = self.value(volume)
+        if volume is None:
+            volume = self.max_volume
+        if volume == 0 or self.num_options == 0:
+            return 0, []  # Trivial scenario catch, as in pick_items_dp()
+        indices = []
+        self._backtrack(self._decisions, decision_row_bytes(self.max_volume), 0, self.num_options, volume, indices)
+        indices.reverse()
+        return total_value, indices
+
+    def _rebuild(self, volume):
+        """
+        Recomputes every row for capacities up to volume
+        """
+        self.max_volume = volume
+        self._checkpoints = [[0] * (volume + 1)]
+        self._decisions = bytearray()
+        self._extend(0, [0] * (volume + 1))
+
+    def _extend(self, start, value_list):
+        """
+        Advances value_list, the value row after parts 0..start-1, across the remaining parts,
+            appending their decision rows and checkpointing every checkpoint_interval parts
+        """
+        row = start
+        while row < self.num_options:
+            end = min((row // self.checkpoint_interval + 1) * self.checkpoint_interval, self.num_options)
+            self._decisions += self._fill_decisions(row, end, value_list)
+            self.rows_computed += end - row
+            if end % self.checkpoint_interval == 0:
+                self._checkpoints.append(list(value_list))
+            row = end
+        self._value_list = value_list
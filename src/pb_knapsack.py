@@ -9,20 +9,236 @@
            a dynamic programming approach (cost of O( len(parts)*Volume) ~ 70000) and the
            meet-in-the-middle (cost of O( len(parts)*2^(len(parts)/2)) ~ 185000000), I concluded
            the dynamic programming approach was better.
+
+           For suitcases with volumes in the hundreds of thousands the per-cell python loop
+           becomes the bottleneck, so an optional numpy backend (pick_items_dp_numpy) updates
+           whole rows at a time with shifted-max array operations. numpy is only imported if
+           available; the pure python solver remains the default.
+
+           Rather than carrying a list of chosen indices for every cell (an O(n) copy per cell),
+           pick_items_dp_bits and the numpy backend record a single keep/skip bit per
+           (part, capacity) in a packed decision table and recover the indices with one backward
+           pass. Bits are packed most significant first, matching numpy.packbits.
+
+           Once n*V bits no longer fits in memory_budget, solve() switches the table engines to
+           pick_items_hirschberg, which splits the parts list recursively and only keeps value
+           rows (never a full decision table) until a slice of the table fits in the budget.
+
+           Not every input matches the profile above (a handful of parts with huge volumes makes
+           O(n*V) hopeless), so meet-in-the-middle (pick_items_mitm) and best-first branch and
+           bound (pick_items_bnb) are available too, and solve('auto') picks the engine with the
+           lowest estimated cost. Taking on ties means pick_items_dp() returns, out of all optimal
+           packings, the one whose bitmask (with the last part as the most significant bit) is
+           largest; the non-dp engines maximize (value, mask) so they return the same packing.
+           They assume positive part volumes, since pick_items_dp() never takes a zero volume
+           part once no space is left.
+
+           Two engines trade exactness for guarantees instead. pick_items_fptas scales values down
+           by epsilon so its value dp is polynomial in n and 1/epsilon, returning at least
+           (1 - epsilon) of the optimum. pick_items_anytime runs the branch and bound until
+           deadline_ms and returns the best packing found. Both leave a proven upper bound on the
+           optimum in self.upper_bound.
+
+           Every engine reads part volumes and values from flat columns (self.volumes and
+           self.values) rather than the part dicts, which keeps string-keyed lookups out of the
+           inner loops and lets a pb_parts.CompactParts be solved without building any dicts.
+
+           pick_items_core cuts the dp down with bounds: parts a greedy lower bound and LP upper
+           bounds prove every optimal packing takes (or none does) are decided up front, leaving a
+           core of parts near the break part, and each dp row only covers the capacities that can
+           still matter. Ties are left untouched, so the answer is exactly pick_items_dp()'s.
+
+           pick_items_sparse runs the same dp with each row held as its Pareto optimal (volume,
+           value) states rather than V + 1 cells, which suits a few parts with huge volumes (say 40
+           parts in a suitcase of 10^8) when their values correlate too well for branch and bound.
+
+           Engines count the work they do: self.cells adds up the dp cells evaluated (by the table
+           engines, hirschberg's recomputed rows included, fptas, and the states merged by sparse)
+           and self.nodes the subsets enumerated by mitm or the nodes expanded by branch and bound
+           (see pb_stats).
 """
 
+import heapq
+import math
+import Queue
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from multiprocessing import cpu_count
+from pb_parts import CompactParts, ARRAY_TYPECODE, part_columns
+from pb_reduce import KnapSack01Reduction
+from pb_stats import cpu_seconds
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Maps engine names (as exposed by pack_bot.py) to the solver method implementing them
+ENGINES = {
+    'dp': 'pick_items_dp',
+    'numpy': 'pick_items_dp_numpy',
+    'parallel': 'pick_items_dp_parallel',
+    'bits': 'pick_items_dp_bits',
+    'hirschberg': 'pick_items_hirschberg',
+    'mitm': 'pick_items_mitm',
+    'bnb': 'pick_items_bnb',
+    'fptas': 'pick_items_fptas',
+    'anytime': 'pick_items_anytime',
+    'core': 'pick_items_core',
+    'sparse': 'pick_items_sparse',
+}
+
+# Engines whose decision table is subject to memory_budget
+TABLE_ENGINES = ('bits', 'numpy', 'parallel')
+
+# Engines that may return less than the optimum, along with an upper bound on it
+APPROXIMATE_ENGINES = ('fptas', 'anytime')
+
+# Engines that need numpy installed
+NUMPY_ENGINES = ('numpy', 'parallel')
+
+# Rough costs relative to one pure python dp cell, used by estimate_costs()
+NUMPY_CELL_COST = 0.02
+NUMPY_ROW_COST = 100
+PARALLEL_ROW_COST = 1000
+MITM_SUBSET_COST = 5
+BNB_NODE_COST = 5
+
+# Default cap on the decision table size, in bytes
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Default relative error allowed by pick_items_fptas
+DEFAULT_EPSILON = 0.1
+
+# Fewest capacities per thread pick_items_dp_parallel splits a row into, unless given a thread count
+PARALLEL_MIN_COLUMNS = 64 * 1024
+
+
+def decision_row_bytes(volume):
+    """
+    Number of bytes needed to hold one keep/skip bit for each capacity 0..volume
+    """
+    return (volume + 8) // 8
+
 
 class KnapSack01Solver(object):
-    def __init__(self, parts, volume):
+    def __init__(self, parts, volume, memory_budget=DEFAULT_MEMORY_BUDGET, epsilon=DEFAULT_EPSILON,
+                 deadline_ms=None, threads=None):
         """
         Class for solving 0-1 knapsacks
 
-        :param parts: list of parts where each parts is a dict of id, volume, and value fields
+        :param parts: list of parts where each parts is a dict of id, volume, and value fields, or a
+            pb_parts.CompactParts (read without building any part dicts)
         :param volume: positive integer for maximum capacity of knapsack
+        :param memory_budget: bytes a decision table may use before pick_items_hirschberg takes over
+        :param epsilon: relative error allowed by pick_items_fptas, between 0 and 1
+        :param deadline_ms: milliseconds pick_items_anytime may search for, or None for no limit
+        :param threads: threads pick_items_dp_parallel splits each row across, or None for one per
+            core (and at least PARALLEL_MIN_COLUMNS capacities each)
         """
         self.max_volume = volume
         self.num_options = len(parts)
         self.parts = parts
+        self.volumes, self.values = part_columns(parts)
+        self.memory_budget = memory_budget
+        self.epsilon = epsilon
+        self.deadline_ms = deadline_ms
+        self.threads = threads
+        self.cpu_utilization = None
+        self.engine = None
+        self.reduction = None
+        self.upper_bound = None
+        self.cells = 0
+        self.nodes = 0
+
+    def table_bytes(self):
+        """
+        Projected size in bytes of the packed decision table for this problem
+        """
+        return self.num_options * decision_row_bytes(self.max_volume)
+
+    def estimate_costs(self):
+        """
+        Estimates the cost of each engine that can solve this problem, in units of one pure python
+            dp cell. Branch and bound is modelled as polynomial when the value/volume ratios are
+            spread out (most branches get pruned) and as exponential when they are all alike.
+
+        :return: dict of engine name to estimated cost
+        """
+        parts_count = self.num_options
+        cells = parts_count * (self.max_volume + 1)
+        costs = {'bits': cells}
+        if parts_count == 0 or self.max_volume == 0:
+            return costs
+        if numpy is not None:
+            costs['numpy'] = cells * NUMPY_CELL_COST + parts_count * NUMPY_ROW_COST
+            # Threads only pay off up to the number of cores
+            threads = min(self.threads or cpu_count(), cpu_count(), (self.max_volume + 1) // PARALLEL_MIN_COLUMNS)
+            if threads > 1:
+                costs['parallel'] = cells * NUMPY_CELL_COST / threads + parts_count * PARALLEL_ROW_COST
+        if self.table_bytes() > self.memory_budget:
+            # Too big for a decision table; hirschberg recomputes rows about log(n) times
+            costs = {'hirschberg': cells * max(1, math.log(parts_count, 2))}
+
+        if all(volume > 0 for volume in self.volumes):
+            half = parts_count - parts_count // 2
+            costs['mitm'] = MITM_SUBSET_COST * (2 ** half) * (half + 1)
+            ratios = [float(value) / volume for volume, value in zip(self.volumes, self.values)]
+            mean = sum(ratios) / parts_count
+            if mean > 0:
+                spread = math.sqrt(sum((ratio - mean) ** 2 for ratio in ratios) / parts_count) / mean
+            else:
+                spread = 0.0
+            depth = min(parts_count * max(0.0, 1.0 - spread) / 2, 1000)
+            costs['bnb'] = BNB_NODE_COST * parts_count * (parts_count + 2 ** depth)
+        return costs
+
+    def choose_engine(self):
+        """
+        Picks the engine with the lowest estimated cost (see estimate_costs)
+
+        :return: engine name
+        """
+        costs = self.estimate_costs()
+        return min(sorted(costs), key=lambda engine: costs[engine])
+
+    def solve(self, engine='dp', reduce=False):
+        """
+        Runs the named engine (see ENGINES), or the cheapest one for engine='auto', and returns
+            total optimal value achieved and the list of indices of parts used. Every engine other
+            than the APPROXIMATE_ENGINES returns the same result as pick_items_dp(). The engine
+            actually run is left in self.engine and a bound on the optimum in self.upper_bound.
+
+        :param engine: string name of the engine to run
+        :param reduce: solve the problem left after KnapSack01Reduction (kept in self.reduction) instead
+        :return: total_value, index_list
+        """
+        if reduce:
+            self.reduction = KnapSack01Reduction(self.parts, self.max_volume)
+            solver = KnapSack01Solver(self.reduction.parts, self.reduction.volume, self.memory_budget,
+                                      self.epsilon, self.deadline_ms, self.threads)
+            total_value, indices = solver.solve(engine)
+            self.engine = solver.engine
+            self.cpu_utilization = solver.cpu_utilization
+            self.cells += solver.cells
+            self.nodes += solver.nodes
+            self.upper_bound = self.reduction.expand(solver.upper_bound, [])[0]
+            return self.reduction.expand(total_value, indices)
+
+        if engine == 'auto':
+            engine = self.choose_engine()
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine: %s" % engine)
+        if engine in TABLE_ENGINES and self.table_bytes() > self.memory_budget:
+            engine = 'hirschberg'
+        self.engine = engine
+        total_value, indices = getattr(self, ENGINES[engine])()
+        if engine not in APPROXIMATE_ENGINES:
+            self.upper_bound = total_value
+        return total_value, indices
 
     def pick_items_dp(self):
         """
@@ -55,11 +271,11 @@ class KnapSack01Solver(object):
             for col in range(1, self.max_volume + 1):
 
                 # If the part would fit at the container size col
-                if self.parts[row - 1]['volume'] <= col:
+                if self.volumes[row - 1] <= col:
 
                     # Get best cumulative value if I include the part and the value if I exclude instead
-                    remainder_volume = col - self.parts[row - 1]['volume']
-                    value_including_item = self.parts[row - 1]['value'] + value_list[remainder_volume]
+                    remainder_volume = col - self.volumes[row - 1]
+                    value_including_item = self.values[row - 1] + value_list[remainder_volume]
                     value_excluding_item = value_list[col]
 
                     # Find which value is better
@@ -84,6 +300,723 @@ class KnapSack01Solver(object):
             # Move the current row results to the containers for the last row
             selection_list = new_selection_list
             value_list = new_value_list
+        self.cells += self.num_options * self.max_volume
 
         # The last entry of the last row is the solution
         return value_list[self.max_volume], selection_list[self.max_volume]
+
+    def pick_items_dp_bits(self):
+        """
+        Dynamic programming solution to knapsack 0-1 that records one keep/skip bit per
+            (part, capacity) in a bytearray instead of per-cell selection lists, then recovers
+            the chosen indices by backtracking. Same tie-breaking as pick_items_dp(). Returns
+            total optimal value achieved and the list of indices of parts used.
+
+        :return: total_value, index_list
+        """
+        if self.max_volume == 0 or self.num_options == 0:
+            return 0, []  # Trivial scenario catch; no space or no parts means nothing to pack
+
+        value_list = [0] * (self.max_volume + 1)
+        decisions = self._fill_decisions(0, self.num_options, value_list)
+        indices = []
+        self._backtrack(decisions, decision_row_bytes(self.max_volume), 0, self.num_options,
+                        self.max_volume, indices)
+        indices.reverse()
+        return value_list[self.max_volume], indices
+
+    def pick_items_hirschberg(self):
+        """
+        Divide-and-conquer solution to knapsack 0-1 for capacities too large for a decision table.
+            The parts are split in half; the value row after the lower half is computed and the
+            upper half is solved on top of it, which fixes the capacity left for the lower half.
+            Halves are split again until their slice of the decision table fits in memory_budget.
+            Only one value row per recursion level is held, so memory is O(V log n) rather than
+            O(n V), at the price of recomputing rows O(log n) times. Same tie-breaking as
+            pick_items_dp(). Returns total optimal value achieved and the list of indices of parts used.
+
+        :return: total_value, index_list
+        """
+        if self.max_volume == 0 or self.num_options == 0:
+            return 0, []  # Trivial scenario catch; no space or no parts means nothing to pack
+
+        indices = []
+        self._pick_range(0, self.num_options, [0] * (self.max_volume + 1), self.max_volume, indices)
+        indices.reverse()
+        return sum(self.values[index] for index in indices), indices
+
+    def _pick_range(self, low, high, base_list, capacity, indices):
+        """
+        Decides parts low..high-1 on top of base_list, the value row after parts 0..low-1, starting
+            from capacity. Chosen indices are appended in descending order.
+
+        :return: the capacity left for parts 0..low-1
+        """
+        if high - low == 1 or (high - low) * decision_row_bytes(capacity) <= self.memory_budget:
+            value_list = base_list[:capacity + 1]
+            decisions = self._fill_decisions(low, high, value_list)
+            return self._backtrack(decisions, decision_row_bytes(capacity), low, high, capacity, indices)
+
+        # The upper half must be decided first, as pick_items_dp() backtracks from the last part
+        middle = (low + high) // 2
+        middle_list = self._advance_values(base_list[:capacity + 1], low, middle)
+        capacity = self._pick_range(middle, high, middle_list, capacity, indices)
+        del middle_list
+        return self._pick_range(low, middle, base_list, capacity, indices)
+
+    def _advance_values(self, value_list, low, high):
+        """
+        Advances value_list in place across parts low..high-1 without recording any decisions
+
+        :return: value_list
+        """
+        capacity = len(value_list) - 1
+        for row in xrange(low, high):
+            part_volume = self.volumes[row]
+            part_value = self.values[row]
+            start = max(part_volume, 1)
+            if start > capacity:
+                continue
+            self.cells += capacity + 1 - start
+            shifted_list = value_list[start - part_volume:capacity + 1 - part_volume]
+            value_list[start:] = map(max, value_list[start:], [value + part_value for value in shifted_list])
+        return value_list
+
+    def _fill_decisions(self, low, high, value_list):
+        """
+        Advances value_list in place across parts low..high-1, recording a keep bit per
+            (part, capacity) for capacities up to len(value_list) - 1
+
+        :return: bytearray decision table with one row per part
+        """
+        capacity = len(value_list) - 1
+        row_bytes = decision_row_bytes(capacity)
+        decisions = bytearray((high - low) * row_bytes)
+        for row in xrange(low, high):
+            part_volume = self.volumes[row]
+            part_value = self.values[row]
+            offset = (row - low) * row_bytes
+            self.cells += max(0, capacity + 1 - max(part_volume, 1))
+            # Walking the columns downwards lets the row be updated in place, since
+            #   value_list[col - part_volume] still holds the previous row's entry
+            for col in xrange(capacity, max(part_volume, 1) - 1, -1):
+                value_including_item = part_value + value_list[col - part_volume]
+                if value_including_item >= value_list[col]:
+                    value_list[col] = value_including_item
+                    decisions[offset + (col >> 3)] |= 0x80 >> (col & 7)
+        return decisions
+
+    def _backtrack(self, decisions, row_bytes, low, high, col, indices):
+        """
+        Walks a packed decision table for parts low..high-1 back from capacity col, appending the
+            chosen part indices in descending order.
+
+        :param decisions: bytearray holding row_bytes bytes of keep bits per part
+        :param row_bytes: bytes per row of the decision table
+        :return: the capacity left for parts 0..low-1
+        """
+        for row in xrange(high - 1, low - 1, -1):
+            if decisions[(row - low) * row_bytes + (col >> 3)] & (0x80 >> (col & 7)):
+                indices.append(row)
+                col -= self.volumes[row]
+        return col
+
+    def pick_items_dp_numpy(self):
+        """
+        Array-backed version of pick_items_dp(). Each row of the value table is computed from the
+            previous row with whole-array operations over the capacity axis, and the keep bits
+            are packed into a decision table so the chosen indices can be recovered by backtracking.
+            Returns total optimal value achieved and the list of indices of parts used.
+
+        :return: total_value, index_list
+        """
+        if numpy is None:
+            raise ImportError("The numpy engine requires numpy to be installed")
+        if self.max_volume == 0 or self.num_options == 0:
+            return 0, []  # Trivial scenario catch; no space or no parts means nothing to pack
+
+        row_bytes = decision_row_bytes(self.max_volume)
+        decisions = bytearray(self.num_options * row_bytes)
+        value_list = numpy.zeros(self.max_volume + 1, dtype=numpy.int64)
+        keep = numpy.zeros(self.max_volume + 1, dtype=numpy.bool_)
+        for row in range(self.num_options):
+            part_volume = self.volumes[row]
+            part_value = self.values[row]
+            if part_volume <= self.max_volume:
+                # Column zero is never filled, matching pick_items_dp() for zero volume parts
+                start = max(part_volume, 1)
+                self.cells += self.max_volume + 1 - start
+                value_including_item = value_list[start - part_volume:self.max_volume + 1 - part_volume] + part_value
+                value_excluding_item = value_list[start:]
+                # Ties take the item, as in pick_items_dp()
+                take = value_including_item >= value_excluding_item
+                keep[:start] = False
+                keep[start:] = take
+                value_list = value_list.copy()
+                value_list[start:] = numpy.where(take, value_including_item, value_excluding_item)
+                decisions[row * row_bytes:(row + 1) * row_bytes] = numpy.packbits(keep).tobytes()
+
+        indices = []
+        self._backtrack(decisions, row_bytes, 0, self.num_options, self.max_volume, indices)
+        indices.reverse()
+        return int(value_list[self.max_volume]), indices
+
+    def pick_items_core(self):
+        """
+        Bounded dynamic programming solution to knapsack 0-1. A greedy packing by value per volume
+            gives a lower bound on the optimum, and the LP relaxation with one part forced in (or out)
+            an upper bound on every packing taking (or leaving) it. A part whose bound falls strictly
+            below the lower bound is taken by every optimal packing, or by none, so it is fixed in or
+            left out without changing which packing wins a tie. The dp then runs over the core of
+            parts left, those with a value per volume near the break part of the greedy order, each
+            row only over the capacities that can still reach the suitcase volume and that the
+            parts so far do not all fit in (every part is taken above that). When the bounds decide
+            every part the dp is skipped. Same result as pick_items_dp(). Returns total optimal value
+            achieved and the list of indices of parts used.
+
+        :return: total_value, index_list
+        """
+        if self.max_volume == 0 or self.num_options == 0:
+            return 0, []  # Trivial scenario catch; no space or no parts means nothing to pack
+        if any(volume <= 0 for volume in self.volumes):
+            # Zero volume parts are never taken once no space is left, which no bound accounts for
+            if self.table_bytes() > self.memory_budget:
+                return self.pick_items_hirschberg()
+            return self.pick_items_dp_bits()
+
+        # Exact value per volume order (float ratios could misorder near ties and break the bounds)
+        volumes, values = self.volumes, self.values
+        order = sorted([index for index in xrange(self.num_options)
+                        if volumes[index] <= self.max_volume and values[index] >= 0],
+                       cmp=lambda first, second: cmp(values[second] * volumes[first],
+                                                     values[first] * volumes[second]))
+        prefix_volumes = [0]
+        prefix_values = [0]
+        lower_bound = 0
+        space = self.max_volume
+        for index in order:
+            prefix_volumes.append(prefix_volumes[-1] + volumes[index])
+            prefix_values.append(prefix_values[-1] + values[index])
+            if volumes[index] <= space:
+                space -= volumes[index]
+                lower_bound += values[index]
+
+        forced = []
+        core = []
+        for position, index in enumerate(order):
+            if self._lp_bound_without(order, prefix_volumes, prefix_values, position,
+                                      self.max_volume) < lower_bound:
+                forced.append(index)
+            elif values[index] + self._lp_bound_without(order, prefix_volumes, prefix_values, position,
+                                                        self.max_volume - volumes[index]) >= lower_bound:
+                core.append(index)
+        # Core parts keep their relative order, which the dp's tie-breaking depends on
+        core.sort()
+        space = self.max_volume - sum(volumes[index] for index in forced)
+        indices = forced + self._pick_core(core, space)
+        indices.sort()
+        return sum(values[index] for index in indices), indices
+
+    def _lp_bound_without(self, order, prefix_volumes, prefix_values, position, space):
+        """
+        Floor of the LP relaxation over the parts of order other than the one at position, for
+            capacity space, in O(log n) from the prefix sums of volume and value along order
+        """
+        part_volume = self.volumes[order[position]]
+        # Largest count of leading parts (skipping position) that fits whole
+        count = bisect_right(prefix_volumes, space + part_volume) - 1
+        if count > position:
+            packed_volume = prefix_volumes[count] - part_volume
+            packed_value = prefix_values[count] - self.values[order[position]]
+        else:
+            count = bisect_right(prefix_volumes, space) - 1
+            packed_volume = prefix_volumes[count]
+            packed_value = prefix_values[count]
+        if count == len(order):
+            return packed_value
+        index = order[count]
+        return packed_value + (space - packed_volume) * self.values[index] // self.volumes[index]
+
+    def _pick_core(self, core, space):
+        """
+        Dynamic programming over the core parts (in ascending order, volumes positive) for capacity
+            space. Row i only covers capacities from space less the volume of the later parts up to
+            the volume of parts 0..i, and keeps the keep bits of that range alone.
+
+        :return: list of the core parts chosen
+        """
+        count = len(core)
+        later_volume = [0] * (count + 1)
+        for row in xrange(count - 1, -1, -1):
+            later_volume[row] = later_volume[row + 1] + self.volumes[core[row]]
+        ranges = []
+        filled = 0
+        for row, index in enumerate(core):
+            part_volume = self.volumes[index]
+            # Below part_volume the row only copies the previous one, so it records no decisions
+            low = max(space - later_volume[row + 1], part_volume)
+            ranges.append((low, max(min(space, filled + part_volume), low - 1)))
+            filled += part_volume
+        if sum((high - low + 8) // 8 for low, high in ranges) > self.memory_budget:
+            parts = CompactParts(list(core), array(ARRAY_TYPECODE, [self.volumes[index] for index in core]),
+                                 array(ARRAY_TYPECODE, [self.values[index] for index in core]))
+            solver = KnapSack01Solver(parts, space, self.memory_budget)
+            chosen = solver.pick_items_hirschberg()[1]
+            self.cells += solver.cells
+            return [core[index] for index in chosen]
+
+        value_list = [0] * (space + 1)
+        rows = []
+        filled = 0
+        total = 0
+        for row, index in enumerate(core):
+            part_volume = self.volumes[index]
+            part_value = self.values[index]
+            low, high = ranges[row]
+            # The previous row holds the value of every part so far wherever they all fit
+            if high > filled:
+                value_list[filled + 1:high + 1] = [total] * (high - filled)
+            decisions = bytearray((high - low + 8) // 8)
+            self.cells += high + 1 - low
+            for col in xrange(high, low - 1, -1):
+                value_including_item = part_value + value_list[col - part_volume]
+                if value_including_item >= value_list[col]:
+                    value_list[col] = value_including_item
+                    bit = col - low
+                    decisions[bit >> 3] |= 0x80 >> (bit & 7)
+            rows.append(decisions)
+            filled += part_volume
+            total += part_value
+
+        chosen = []
+        col = space
+        for row in xrange(count - 1, -1, -1):
+            low, high = ranges[row]
+            bit = col - low
+            if col > high or (col >= low and rows[row][bit >> 3] & (0x80 >> (bit & 7))):
+                chosen.append(core[row])
+                col -= self.volumes[core[row]]
+        chosen.reverse()
+        return chosen
+
+    def pick_items_sparse(self):
+        """
+        Sparse dynamic programming solution to knapsack 0-1. Each row of the value table is a step
+            function of capacity, kept as its Pareto optimal states only: (volume, value) pairs sorted
+            by volume with strictly increasing values, the value at a capacity being that of the last
+            state no larger. A row is the previous one merged with itself shifted by the part, with
+            dominated states pruned, so time and memory scale with the number of such states rather
+            than the volume. Every row is kept and backtracking repeats pick_items_dp()'s comparison
+            for the capacity left, so the result is the same. Returns total optimal value achieved
+            and the list of indices of parts used.
+
+        :return: total_value, index_list
+        """
+        if self.max_volume == 0 or self.num_options == 0:
+            return 0, []  # Trivial scenario catch; no space or no parts means nothing to pack
+
+        # Values live in typed arrays too unless their total could outgrow a machine word
+        if sum(value for value in self.values if value > 0) <= sys.maxint:
+            value_type = lambda values: array(ARRAY_TYPECODE, values)
+        else:
+            value_type = list
+        rows = [(array(ARRAY_TYPECODE, [0]), value_type([0]))]
+        for row in xrange(self.num_options):
+            state_volumes, state_values = rows[-1]
+            part_volume = self.volumes[row]
+            part_value = self.values[row]
+            # Column zero is never filled, matching pick_items_dp() for zero volume parts
+            start = max(part_volume, 1)
+            if start > self.max_volume:
+                rows.append(rows[-1])
+                continue
+            # The shifted row starts at start with the best state fitting start - part_volume
+            first = bisect_right(state_volumes, start - part_volume) - 1
+            last = bisect_right(state_volumes, self.max_volume - part_volume)
+            shifted = [(start, state_values[first] + part_value)]
+            shifted.extend((state_volumes[state] + part_volume, state_values[state] + part_value)
+                           for state in xrange(first + 1, last))
+            new_volumes, new_values = self._merge_states(zip(state_volumes, state_values), shifted)
+            self.cells += len(state_volumes) + len(shifted)
+            rows.append((array(ARRAY_TYPECODE, new_volumes), value_type(new_values)))
+
+        indices = []
+        col = self.max_volume
+        for row in xrange(self.num_options - 1, -1, -1):
+            state_volumes, state_values = rows[row]
+            part_volume = self.volumes[row]
+            if col < max(part_volume, 1):
+                continue
+            value_including_item = self.values[row] + state_values[bisect_right(state_volumes, col - part_volume) - 1]
+            value_excluding_item = state_values[bisect_right(state_volumes, col) - 1]
+            # Ties take the item, as in pick_items_dp()
+            if value_including_item >= value_excluding_item:
+                indices.append(row)
+                col -= part_volume
+        indices.reverse()
+        return rows[-1][1][-1], indices
+
+    @staticmethod
+    def _merge_states(states, shifted):
+        """
+        Pareto optimal states of the pointwise max of two step functions, each given as a list of
+            (volume, value) states sorted by volume with increasing values
+
+        :return: list of volumes, list of values
+        """
+        volumes = []
+        values = []
+        best = None
+        first = 0
+        second = 0
+        while first < len(states) or second < len(shifted):
+            if second == len(shifted) or (first < len(states) and states[first] <= shifted[second]):
+                volume, value = states[first]
+                first += 1
+            else:
+                volume, value = shifted[second]
+                second += 1
+            if best is None or value > best:
+                if volumes and volumes[-1] == volume:
+                    values[-1] = value
+                else:
+                    volumes.append(volume)
+                    values.append(value)
+                best = value
+        return volumes, values
+
+    def pick_items_dp_parallel(self):
+        """
+        Multi-threaded version of pick_items_dp_numpy() for a single huge problem. The capacity
+            axis is split into one band of whole decision bytes per thread; for every part each
+            thread computes its band of the new value row from the shared previous row (reading
+            to its left, never past its own band) and packs its own keep bits, the rows being
+            double buffered. numpy releases the GIL over whole-array operations, so the bands run
+            on separate cores. The values and decision table are those of the serial engines, so
+            the result is identical. CPU seconds over wall seconds spent on the rows is left in
+            self.cpu_utilization: how busy the threads kept the cores (at most the thread count),
+            not a speedup, as queue handoffs and band overhead keep cores busy too. pack_bench.py
+            measures the speedup against the serial numpy engine. Returns total optimal value
+            achieved and the list of indices of parts used.
+
+        :return: total_value, index_list
+        """
+        if numpy is None:
+            raise ImportError("The parallel engine requires numpy to be installed")
+        if self.max_volume == 0 or self.num_options == 0:
+            return 0, []  # Trivial scenario catch; no space or no parts means nothing to pack
+
+        capacity = self.max_volume
+        row_bytes = decision_row_bytes(capacity)
+        if self.threads is None:
+            threads = min(cpu_count(), max(1, (capacity + 1) // PARALLEL_MIN_COLUMNS))
+        else:
+            threads = max(1, min(self.threads, row_bytes))
+        bounds = [row_bytes * band // threads * 8 for band in xrange(threads)] + [capacity + 1]
+        decisions = numpy.zeros(self.num_options * row_bytes, dtype=numpy.uint8)
+        rows = [numpy.zeros(capacity + 1, dtype=numpy.int64), numpy.zeros(capacity + 1, dtype=numpy.int64)]
+        including_buffers = [numpy.empty(bounds[band + 1] - bounds[band], dtype=numpy.int64)
+                             for band in xrange(threads)]
+        keep_buffers = [numpy.empty(bounds[band + 1] - bounds[band], dtype=numpy.bool_) for band in xrange(threads)]
+
+        def fill_band(band, row):
+            low, high = bounds[band], bounds[band + 1]
+            previous, current = rows[row & 1], rows[(row + 1) & 1]
+            part_volume = self.volumes[row]
+            # Column zero is never filled, matching pick_items_dp() for zero volume parts
+            start = min(max(part_volume, 1, low), high)
+            current[low:start] = previous[low:start]
+            if start == high:
+                return  # The part fits nowhere in this band, so no keep bits are set
+            including = including_buffers[band][start - low:]
+            keep = keep_buffers[band]
+            numpy.add(previous[start - part_volume:high - part_volume], self.values[row], out=including)
+            # Ties take the item, as in pick_items_dp()
+            keep[:start - low] = False
+            numpy.greater_equal(including, previous[start:high], out=keep[start - low:])
+            numpy.maximum(including, previous[start:high], out=current[start:high])
+            offset = row * row_bytes + low // 8
+            decisions[offset:offset + (high - low + 7) // 8] = numpy.packbits(keep)
+
+        def work(band, tasks, done):
+            for row in iter(tasks.get, None):
+                try:
+                    fill_band(band, row)
+                except Exception:
+                    done.put(sys.exc_info())
+                else:
+                    done.put(None)
+
+        # The calling thread fills the first band itself
+        done = Queue.Queue()
+        task_queues = [Queue.Queue() for band in xrange(1, threads)]
+        workers = [threading.Thread(target=work, args=(band, tasks, done))
+                   for band, tasks in enumerate(task_queues, 1)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        start_time = time.time()
+        start_cpu = cpu_seconds()
+        try:
+            for row in xrange(self.num_options):
+                for tasks in task_queues:
+                    tasks.put(row)
+                fill_band(0, row)
+                failures = [failure for failure in [done.get() for tasks in task_queues] if failure is not None]
+                if failures:
+                    raise failures[0][0], failures[0][1], failures[0][2]
+                self.cells += max(0, capacity + 1 - max(self.volumes[row], 1))
+        finally:
+            for tasks in task_queues:
+                tasks.put(None)
+            for worker in workers:
+                worker.join()
+        wall = time.time() - start_time
+        self.cpu_utilization = (cpu_seconds() - start_cpu) / wall if wall > 0 else 1.0
+
+        indices = []
+        self._backtrack(decisions, row_bytes, 0, self.num_options, capacity, indices)
+        indices.reverse()
+        return int(rows[self.num_options & 1][capacity]), indices
+
+    def pick_items_mitm(self):
+        """
+        Meet-in-the-middle solution to knapsack 0-1. Every subset of each half of the parts is
+            enumerated, the lower half's subsets are sorted by volume with a running best, and each
+            upper half subset is paired with the best lower half subset that still fits. Costs
+            O(n 2^(n/2)) regardless of volume. Returns total optimal value achieved and the list of
+            indices of parts used.
+
+        :return: total_value, index_list
+        """
+        if self.max_volume == 0 or self.num_options == 0:
+            return 0, []  # Trivial scenario catch; no space or no parts means nothing to pack
+        self._require_positive_volumes('mitm')
+
+        half = self.num_options // 2
+        lower_subsets = self._enumerate_subsets(0, half)
+        lower_subsets.sort()
+        # Running best (value, mask) for lower subsets no larger than each volume
+        lower_volumes = []
+        lower_best = []
+        for volume, value, mask in lower_subsets:
+            if not lower_best or (value, mask) > lower_best[-1]:
+                lower_volumes.append(volume)
+                lower_best.append((value, mask))
+        del lower_subsets
+
+        best_key = None
+        for volume, value, mask in self._enumerate_subsets(half, self.num_options):
+            # The empty lower subset always fits, so position is never negative
+            position = bisect_right(lower_volumes, self.max_volume - volume) - 1
+            lower_value, lower_mask = lower_best[position]
+            key = (value + lower_value, mask | lower_mask)
+            if best_key is None or key > best_key:
+                best_key = key
+
+        total_value, mask = best_key
+        return total_value, self._mask_indices(mask)
+
+    def _enumerate_subsets(self, low, high):
+        """
+        Lists every subset of parts low..high-1 that fits in the knapsack
+
+        :return: list of (volume, value, mask) tuples, mask having bit i set for part i
+        """
+        subsets = [(0, 0, 0)]
+        for index in xrange(low, high):
+            part_volume = self.volumes[index]
+            part_value = self.values[index]
+            if part_volume > self.max_volume:
+                continue
+            bit = 1 << index
+            subsets.extend([(volume + part_volume, value + part_value, mask | bit)
+                            for volume, value, mask in subsets if volume + part_volume <= self.max_volume])
+        self.nodes += len(subsets)
+        return subsets
+
+    def pick_items_bnb(self):
+        """
+        Best-first branch and bound solution to knapsack 0-1. Parts are decided from the last one
+            down, taking before skipping, and nodes are expanded in order of their fractional
+            relaxation bound (ties go to the node that could still reach the larger mask), so the
+            first complete packing popped is the answer. Nodes whose bound falls below the best
+            packing seen so far are dropped. Returns total optimal value achieved and the list of
+            indices of parts used.
+
+        :return: total_value, index_list
+        """
+        if self.max_volume == 0 or self.num_options == 0:
+            return 0, []  # Trivial scenario catch; no space or no parts means nothing to pack
+        self._require_positive_volumes('bnb')
+
+        total_value, mask = self._branch_and_bound(None)[:2]
+        return total_value, self._mask_indices(mask)
+
+    def pick_items_anytime(self):
+        """
+        Branch and bound (see pick_items_bnb) stopped after deadline_ms, returning the best packing
+            found so far; the largest bound left in the queue is kept in self.upper_bound. Without
+            a deadline, or if the search finishes in time, the packing is optimal. Returns total
+            value achieved and the list of indices of parts used.
+
+        :return: total_value, index_list
+        """
+        if self.max_volume == 0 or self.num_options == 0:
+            self.upper_bound = 0
+            return 0, []  # Trivial scenario catch; no space or no parts means nothing to pack
+
+        total_value, mask, self.upper_bound = self._branch_and_bound(self.deadline_ms)
+        return total_value, self._mask_indices(mask)
+
+    def _branch_and_bound(self, deadline_ms):
+        """
+        Best-first search shared by pick_items_bnb and pick_items_anytime. The best packing seen so far
+            is kept from the greedy completions of each node.
+
+        :param deadline_ms: milliseconds to search for, or None to search until optimal
+        :return: total_value, mask, upper_bound
+        """
+        order = self._ratio_order()
+        bound = self._fractional_bound(order, self.num_options, self.max_volume)[0]
+        best_value, best_mask = self._greedy_fill(order, self.num_options, self.max_volume, 0, 0)
+        deadline = None if deadline_ms is None else time.time() + deadline_ms / 1000.0
+        # Heap entries: (-bound, -largest reachable mask, undecided count, space left, value, mask)
+        heap = [(-bound, -((1 << self.num_options) - 1), self.num_options, self.max_volume, 0, 0)]
+        while heap:
+            if deadline is not None and time.time() >= deadline:
+                return best_value, best_mask, max(best_value, -heap[0][0])
+            node = heapq.heappop(heap)
+            self.nodes += 1
+            undecided, space, value, mask = node[2:]
+            if undecided == 0:
+                return value, mask, value
+
+            index = undecided - 1
+            rest_mask = (1 << index) - 1
+            part_volume = self.volumes[index]
+            children = [(space, value, mask)]
+            if part_volume <= space:
+                children.insert(0, (space - part_volume, value + self.values[index], mask | (1 << index)))
+            for child_space, child_value, child_mask in children:
+                bound, greedy_value = self._fractional_bound(order, index, child_space)
+                if child_value + greedy_value > best_value:
+                    best_value, best_mask = self._greedy_fill(order, index, child_space, child_value, child_mask)
+                if child_value + bound >= best_value:
+                    heapq.heappush(heap, (-(child_value + bound), -(child_mask | rest_mask), index,
+                                          child_space, child_value, child_mask))
+        return best_value, best_mask, best_value
+
+    def pick_items_fptas(self):
+        """
+        Fully polynomial approximation scheme for knapsack 0-1. Values are divided by
+            epsilon * (largest value) / n and rounded down, then a dp over the scaled value finds
+            the least volume reaching each value; the best value that fits is at least
+            (1 - epsilon) of the optimum. Costs O(n^3 / epsilon) whatever the volume. Returns
+            total value achieved and the list of indices of parts used.
+
+        :return: total_value, index_list
+        """
+        candidates = [index for index in xrange(self.num_options)
+                      if self.values[index] > 0 and self.volumes[index] <= self.max_volume]
+        if self.max_volume == 0 or not candidates:
+            self.upper_bound = 0
+            return 0, []  # Trivial scenario catch; no space or no parts means nothing to pack
+
+        largest_value = max(self.values[index] for index in candidates)
+        scale = max(1.0, self.epsilon * largest_value / len(candidates))
+        scaled_values = [int(self.values[index] // scale) for index in candidates]
+        total_scaled = sum(scaled_values)
+
+        # min_volumes[target] is the least volume reaching scaled value target so far
+        min_volumes = [0] + [self.max_volume + 1] * total_scaled
+        row_bytes = decision_row_bytes(total_scaled)
+        decisions = bytearray(len(candidates) * row_bytes)
+        reachable = 0
+        for row, index in enumerate(candidates):
+            part_volume = self.volumes[index]
+            scaled_value = scaled_values[row]
+            offset = row * row_bytes
+            reachable += scaled_value
+            self.cells += reachable + 1 - scaled_value
+            for target in xrange(reachable, scaled_value - 1, -1):
+                volume_including_item = min_volumes[target - scaled_value] + part_volume
+                if volume_including_item < min_volumes[target]:
+                    min_volumes[target] = volume_including_item
+                    decisions[offset + (target >> 3)] |= 0x80 >> (target & 7)
+
+        target = max(target for target in xrange(total_scaled + 1) if min_volumes[target] <= self.max_volume)
+        indices = []
+        for row in xrange(len(candidates) - 1, -1, -1):
+            if decisions[row * row_bytes + (target >> 3)] & (0x80 >> (target & 7)):
+                indices.append(candidates[row])
+                target -= scaled_values[row]
+        indices.reverse()
+        total_value = sum(self.values[index] for index in indices)
+
+        self.upper_bound = self._fractional_bound(self._ratio_order(), self.num_options, self.max_volume)[0]
+        if scale == 1.0:
+            self.upper_bound = total_value  # Nothing was rounded, so the answer is exact
+        elif self.epsilon < 1:
+            self.upper_bound = min(self.upper_bound, int(math.floor(total_value / (1 - self.epsilon))))
+        return total_value, indices
+
+    def _ratio_order(self):
+        """
+        Indices of the positive valued parts sorted by value per volume, best first
+        """
+        candidates = [index for index in xrange(self.num_options) if self.values[index] > 0]
+        return sorted(candidates, key=self._density, reverse=True)
+
+    def _density(self, index):
+        if self.volumes[index] == 0:
+            return float('inf')
+        return float(self.values[index]) / self.volumes[index]
+
+    def _fractional_bound(self, order, undecided, space):
+        """
+        Fractional relaxation over parts 0..undecided-1: packs whole parts by value density and a
+            fraction of the first one that does not fit.
+
+        :param order: part indices as given by _ratio_order()
+        :return: (integer upper bound on the value addable, value of the whole parts packed)
+        """
+        whole_value = 0
+        for index in order:
+            if index >= undecided:
+                continue
+            part_volume = self.volumes[index]
+            if part_volume <= space:
+                space -= part_volume
+                whole_value += self.values[index]
+            else:
+                return whole_value + space * self.values[index] // part_volume, whole_value
+        return whole_value, whole_value
+
+    def _greedy_fill(self, order, undecided, space, value, mask):
+        """
+        Completes a partial packing with the whole parts the fractional relaxation over parts
+            0..undecided-1 would pack
+
+        :return: value, mask of the completed packing
+        """
+        for index in order:
+            if index >= undecided:
+                continue
+            part_volume = self.volumes[index]
+            if part_volume > space:
+                break
+            space -= part_volume
+            value += self.values[index]
+            mask |= 1 << index
+        return value, mask
+
+    def _mask_indices(self, mask):
+        """
+        Ascending list of the part indices set in mask
+        """
+        return [index for index in xrange(self.num_options) if mask >> index & 1]
+
+    def _require_positive_volumes(self, engine):
+        if any(volume <= 0 for volume in self.volumes):
+            raise ValueError("The %s engine requires every part volume to be positive" % engine)
@@ -0,0 +1,126 @@
+"""
+    pb_memo.py
+        Author: Theodore Enns
+        Brief: Memoization of knapsack 0-1 solutions across identical problems.
+
+           Identical (volume, parts) problems come up again and again across a fleet. Problems are
+           keyed by a hash of the capacity and the (volume, value) pairs in part order, so part ids
+           do not matter, and solutions are kept in an in-memory LRU tier backed by an optional
+           on-disk tier. A hit returns the stored indices, exactly the answer a fresh solve gives.
+           The same parts in another order are another problem: which optimal packing wins a tie
+           depends on the part order, so stored indices can not be mapped onto reordered parts
+           without risking an answer pick_items_dp() would not give. Approximate engines are not
+           memoized.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pb_knapsack import APPROXIMATE_ENGINES
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class SolutionCache(object):
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, directory=None):
+        """
+        Two tier cache of solutions keyed by canonical problem hash
+
+        :param max_entries: solutions kept in memory, least recently used evicted first
+        :param directory: path of the on-disk tier (created if missing), or None for memory only
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def solve(self, solver, engine='dp', reduce=False):
+        """
+        Returns the memoized solution of solver's problem, solving and storing it on a miss. On a
+            hit solver.engine is set to 'memo'.
+
+        :param solver: KnapSack01Solver holding the problem
+        :param engine: engine to solve with on a miss (see KnapSack01Solver.solve)
+        :param reduce: whether to preprocess on a miss (see KnapSack01Solver.solve)
+        :return: total_value, index_list
+        """
+        if engine in APPROXIMATE_ENGINES:
+            return solver.solve(engine, reduce)
+        solution = self.lookup(solver)
+        if solution is not None:
+            return solution
+        total_value, indices = solver.solve(engine, reduce)
+        self.store(solver, total_value, indices)
+        return total_value, indices
+
+    def lookup(self, solver):
+        """
+        Returns the memoized solution of solver's problem, setting solver.engine to 'memo', or None
+            on a miss. Safe to call from several threads.
+
+        :param solver: KnapSack01Solver holding the problem
+        :return: total_value, index_list or None
+        """
+        key = self._key(solver)
+        with self._lock:
+            entry = self._get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        solver.engine = 'memo'
+        solver.upper_bound = entry['value']
+        return entry['value'], list(entry['indices'])
+
+    def store(self, solver, total_value, indices):
+        """
+        Memoizes an exact solution of solver's problem. Safe to call from several threads.
+
+        :param solver: KnapSack01Solver holding the problem
+        :param total_value: total value of the solution
+        :param indices: index list of the solution
+        """
+        key = self._key(solver)
+        with self._lock:
+            self._put(key, {'value': total_value, 'indices': list(indices)})
+
+    def _key(self, solver):
+        """
+        :return: cache key, a hash of the capacity and the (volume, value) pairs in part order
+        """
+        return self._hash([solver.max_volume, zip(solver.volumes, solver.values)])
+
+    def _hash(self, problem):
+        return hashlib.sha1(json.dumps(problem, separators=(',', ':'))).hexdigest()
+
+    def _get(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None and self.directory is not None:
+            try:
+                with open(os.path.join(self.directory, key + '.json'), 'r') as memo_file:
+                    entry = json.load(memo_file)
+            except (IOError, ValueError):
+                entry = None
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def _put(self, key, entry):
+        self._remember(key, entry)
+        if self.directory is not None:
+            descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(descriptor, 'w') as memo_file:
+                json.dump(entry, memo_file)
+            os.rename(temporary_path, os.path.join(self.directory, key + '.json'))
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
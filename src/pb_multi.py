@@ -0,0 +1,307 @@
+"""
+    pb_multi.py
+        Author: Theodore Enns
+        Brief: Packing several suitcases at once (0-1 multiple knapsack).
+
+           Some robots ship with several suitcases, and packing them one after the other is not
+           optimal in general. MultiKnapSack01Solver assigns each part to at most one suitcase:
+             - a warm start packs the suitcases one at a time, largest first, each with the
+               chosen KnapSack01Solver engine over the parts left
+             - pooling every suitcase into one of their total volume (the surrogate relaxation)
+               and solving that with the same engine bounds the optimum from above
+             - with many small parts the bound can nearly always be reached, so the surrogate
+               solution is split across the suitcases: each is filled with as much of it as fits
+               (a subset sum), and the space left is filled with the other parts
+             - when a gap remains, a depth-first branch and bound over the parts by value per
+               volume closes it. Nodes are pruned with the better of the fractional bound over
+               the space left and a precomputed integer surrogate bound for the parts left; a
+               part is never tried in two suitcases with the same space left, and leaving a part
+               out leaves out the later parts it dominates (no less volume, no more value)
+           Search stops as soon as a packing reaches the surrogate bound, and after deadline_ms if
+           given, in which case the best packing found is returned and self.upper_bound holds the
+           proven bound. With a single suitcase the answer is exactly KnapSack01Solver.solve()'s.
+"""
+
+import sys
+import time
+from array import array
+from pb_knapsack import KnapSack01Solver, DEFAULT_MEMORY_BUDGET, DEFAULT_EPSILON
+from pb_parts import CompactParts, ARRAY_TYPECODE
+
+
+class MultiKnapSack01Solver(KnapSack01Solver):
+    def __init__(self, parts, volumes, memory_budget=DEFAULT_MEMORY_BUDGET, epsilon=DEFAULT_EPSILON,
+                 deadline_ms=None, threads=None):
+        """
+        Class for solving 0-1 multiple knapsacks. As a KnapSack01Solver it holds the surrogate
+            problem: every part and the total volume of the suitcases.
+
+        :param parts: list of parts where each parts is a dict of id, volume, and value fields, or a
+            pb_parts.CompactParts
+        :param volumes: list of non-negative integer suitcase volumes
+        :param memory_budget: see KnapSack01Solver
+        :param epsilon: see KnapSack01Solver
+        :param deadline_ms: milliseconds the search may run for, or None to search until optimal
+        :param threads: see KnapSack01Solver
+        """
+        KnapSack01Solver.__init__(self, parts, sum(volumes), memory_budget, epsilon, deadline_ms, threads)
+        self.suitcase_volumes = list(volumes)
+
+    def pick_items_multi(self, engine='dp', reduce=False):
+        """
+        Assigns parts to suitcases maximizing the total value packed. The engine (and
+            preprocessing) is used for the single suitcase solves of the warm start and bound.
+            The engine run for those is left in self.engine and a bound on the optimum in
+            self.upper_bound.
+
+        :param engine: string name of a KnapSack01Solver engine, or 'auto'
+        :param reduce: preprocess the single suitcase solves (see KnapSack01Solver.solve)
+        :return: total_value, list with the index list of parts packed in each suitcase
+        """
+        if len(self.suitcase_volumes) == 1:
+            total_value, indices = self.solve(engine, reduce)
+            return total_value, [indices]
+
+        # Zero volume parts fit anywhere; parts without value or too big for every suitcase never help
+        largest_volume = max(self.suitcase_volumes or [0])
+        free = [index for index in xrange(self.num_options) if self.volumes[index] == 0 and self.values[index] > 0]
+        candidates = [index for index in xrange(self.num_options)
+                      if 0 < self.volumes[index] <= largest_volume and self.values[index] > 0]
+        free_value = sum(self.values[index] for index in free)
+
+        best_value, assignment = self._sequential_fill(candidates, engine, reduce)
+        surrogate = self._sub_solver(candidates, sum(self.suitcase_volumes))
+        surrogate_indices = surrogate.solve(engine, reduce)[1]
+        self._add_work(surrogate)
+        self.engine = surrogate.engine
+        bound = surrogate.upper_bound
+        by_volume = sorted(xrange(len(self.suitcase_volumes)), key=lambda suitcase: self.suitcase_volumes[suitcase])
+        for suitcases in (by_volume, by_volume[::-1]):
+            if best_value >= bound:
+                break
+            split = self._split_fill([surrogate.parts.ids[index] for index in surrogate_indices], candidates,
+                                     suitcases, engine)
+            if split[0] > best_value:
+                best_value, assignment = split
+        if best_value < bound:
+            best_value, assignment, finished = self._search(candidates, best_value, assignment, bound)
+            if finished:
+                bound = best_value
+        self.upper_bound = bound + free_value
+
+        packed = [[] for volume in self.suitcase_volumes]
+        if free and packed:
+            packed[0].extend(free)
+        for index, suitcase in assignment.items():
+            packed[suitcase].append(index)
+        for indices in packed:
+            indices.sort()
+        return best_value + free_value, packed
+
+    def _sub_solver(self, candidates, volume, values=None):
+        """
+        KnapSack01Solver over the candidate parts, whose ids are their indices in self.parts
+
+        :param values: values to solve with in place of the parts' own, in the order of candidates
+        """
+        if values is None:
+            values = array(ARRAY_TYPECODE, [self.values[index] for index in candidates])
+        parts = CompactParts(list(candidates), array(ARRAY_TYPECODE, [self.volumes[index] for index in candidates]),
+                             values)
+        return KnapSack01Solver(parts, volume, self.memory_budget, self.epsilon, self.deadline_ms, self.threads)
+
+    def _add_work(self, solver):
+        """
+        Counts the cells and nodes a sub solver evaluated as this solver's own
+        """
+        self.cells += solver.cells
+        self.nodes += solver.nodes
+
+    def _split_fill(self, chosen, candidates, suitcases, engine):
+        """
+        Packing that tries to split the surrogate solution across the suitcases: each suitcase in
+            turn is filled with as much volume (then value) of the chosen parts left as fits, then
+            the space left in each is filled with the candidates left
+
+        :param chosen: part indices of the surrogate solution
+        :param suitcases: suitcase indices in the order they are filled
+        :return: total_value, dict of part index to suitcase
+        """
+        assignment = {}
+        spaces = list(self.suitcase_volumes)
+        for pool in (chosen, candidates):
+            for suitcase in suitcases:
+                left = [index for index in pool if index not in assignment]
+                if pool is chosen:
+                    # Python longs; the weighted values may not fit in a machine word
+                    weight = sum(self.values[index] for index in left) + 1
+                    solver = self._sub_solver(left, spaces[suitcase],
+                                              [self.volumes[index] * weight + self.values[index] for index in left])
+                else:
+                    solver = self._sub_solver(left, spaces[suitcase])
+                indices = solver.solve(engine)[1]
+                self._add_work(solver)
+                for index in indices:
+                    assignment[solver.parts.ids[index]] = suitcase
+                    spaces[suitcase] -= self.volumes[solver.parts.ids[index]]
+        return sum(self.values[index] for index in assignment), assignment
+
+    def _sequential_fill(self, candidates, engine, reduce):
+        """
+        Warm start packing the suitcases one at a time, largest first, each over the parts left
+
+        :return: total_value, dict of part index to suitcase
+        """
+        total_value = 0
+        assignment = {}
+        left = list(candidates)
+        for suitcase in sorted(xrange(len(self.suitcase_volumes)), key=lambda suitcase: -self.suitcase_volumes[suitcase]):
+            solver = self._sub_solver(left, self.suitcase_volumes[suitcase])
+            value, indices = solver.solve(engine, reduce)
+            self._add_work(solver)
+            total_value += value
+            for index in indices:
+                assignment[solver.parts.ids[index]] = suitcase
+            left = [index for index in left if index not in assignment]
+        return total_value, assignment
+
+    def _search(self, candidates, best_value, best_assignment, bound):
+        """
+        Depth-first branch and bound over the candidates by value per volume, trying each part in
+            every suitcase it fits (one per distinct space left) before leaving it out
+
+        :return: total_value, dict of part index to suitcase, whether the search finished
+        """
+        order = sorted(candidates, key=self._density, reverse=True)
+        count = len(order)
+        # Smallest volume among the parts from each position on, to ignore space nothing can use
+        smallest_after = [sys.maxint] * (count + 1)
+        for position in xrange(count - 1, -1, -1):
+            smallest_after[position] = min(smallest_after[position + 1], self.volumes[order[position]])
+        deadline = None if self.deadline_ms is None else time.time() + self.deadline_ms / 1000.0
+        spaces = list(self.suitcase_volumes)
+        chosen = [None] * count
+        best = [best_value, best_assignment]
+        # A part left out lets every later part with no less volume and no more value be left out
+        #   too, since swapping it in for one of them never loses value
+        dominated = [[later for later in xrange(position + 1, count)
+                      if self.volumes[order[later]] >= self.volumes[order[position]]
+                      and self.values[order[later]] <= self.values[order[position]]]
+                     for position in xrange(count)]
+        banned = [0] * count
+        suffix_values = self._suffix_values(order)
+
+        def enter(position, value):
+            # Visits the node for the parts from position on: True or False once it is settled
+            #   without branching (whether its search finished), None once its frame is pushed
+            while True:
+                self.nodes += 1
+                if value > best[0]:
+                    best[0] = value
+                    best[1] = dict((order[item], chosen[item]) for item in xrange(position)
+                                   if chosen[item] is not None)
+                if position == count or best[0] >= bound:
+                    return True
+                if deadline is not None and self.nodes & 1023 == 0 and time.time() >= deadline:
+                    return False
+                if not banned[position]:
+                    break
+                position += 1
+            smallest = smallest_after[position]
+            space_bound = self._space_bound(order, position, spaces, smallest, banned)
+            if suffix_values is not None:
+                space_bound = min(space_bound, suffix_values[position][sum(space for space in spaces
+                                                                           if space >= smallest)])
+            if value + space_bound <= best[0]:
+                return True
+            # Frame: position, value, next suitcase to try (past the end once leaving the part out),
+            #   spaces tried, suitcase the part is in while its branch is searched
+            stack.append([position, value, 0, set(), None])
+            return None
+
+        # An explicit stack rather than recursion, as the depth can reach the candidate count
+        stack = []
+        finished = enter(0, 0)
+        while stack:
+            frame = stack[-1]
+            position, value, next_suitcase, tried, placed = frame
+            index = order[position]
+            part_volume = self.volumes[index]
+            if placed is not None:
+                # Back from searching with the part in suitcase placed
+                spaces[placed] += part_volume
+                chosen[position] = None
+                frame[4] = None
+                if not finished or best[0] >= bound:
+                    stack.pop()
+                    finished = finished or best[0] >= bound
+                    continue
+            elif next_suitcase > len(spaces):
+                # Back from searching with the part left out
+                for later in dominated[position]:
+                    banned[later] -= 1
+                stack.pop()
+                continue
+            while next_suitcase < len(spaces) and (spaces[next_suitcase] < part_volume
+                                                   or spaces[next_suitcase] in tried):
+                next_suitcase += 1
+            if next_suitcase < len(spaces):
+                tried.add(spaces[next_suitcase])
+                spaces[next_suitcase] -= part_volume
+                chosen[position] = next_suitcase
+                frame[2] = next_suitcase + 1
+                frame[4] = next_suitcase
+                finished = enter(position + 1, value + self.values[index])
+            else:
+                for later in dominated[position]:
+                    banned[later] += 1
+                frame[2] = len(spaces) + 1
+                finished = enter(position + 1, value)
+
+        return best[0], best[1], finished or best[0] >= bound
+
+    def _suffix_values(self, order):
+        """
+        Integer surrogate bounds for the search: row p holds, for every pooled space up to the total
+            suitcase volume, the best value of the parts from position p on. One dp over the parts
+            in reverse, kept only if the rows fit in memory_budget.
+
+        :return: list of rows (array per position, plus an all zero row), or None
+        """
+        capacity = sum(self.suitcase_volumes)
+        if (len(order) + 1) * (capacity + 1) * array(ARRAY_TYPECODE).itemsize > self.memory_budget:
+            return None
+        value_list = [0] * (capacity + 1)
+        rows = [array(ARRAY_TYPECODE, value_list)]
+        for index in reversed(order):
+            part_volume = self.volumes[index]
+            part_value = self.values[index]
+            if part_volume <= capacity:
+                self.cells += capacity + 1 - part_volume
+                shifted_list = value_list[:capacity + 1 - part_volume]
+                value_list[part_volume:] = map(max, value_list[part_volume:],
+                                               [value + part_value for value in shifted_list])
+            rows.append(array(ARRAY_TYPECODE, value_list))
+        rows.reverse()
+        return rows
+
+    def _space_bound(self, order, position, spaces, smallest, banned):
+        """
+        Fractional bound on the value the parts from position on can add: whole parts by value
+            per volume into the pooled space of the suitcases, counting only suitcases with room for
+            the smallest part left and skipping banned parts and parts too big for every suitcase
+        """
+        largest = max(spaces)
+        space = sum(space for space in spaces if space >= smallest)
+        total = 0
+        for later in xrange(position, len(order)):
+            index = order[later]
+            part_volume = self.volumes[index]
+            if part_volume > largest or banned[later]:
+                continue
+            if part_volume <= space:
+                space -= part_volume
+                total += self.values[index]
+            else:
+                return total + space * self.values[index] // part_volume
+        return total
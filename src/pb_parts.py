@@ -0,0 +1,87 @@
+"""
+    pb_parts.py
+        Author: Theodore Enns
+        Brief: A compact, array-backed parts list.
+
+           A list of part dicts costs a few hundred bytes per part, and the solver's inner loops
+           pay a string-keyed lookup for every volume and value they read. CompactParts keeps the
+           volumes and values in typed arrays (machine longs) and the ids in a plain list.
+           KnapSack01Solver reads the arrays directly; indexing or iterating a CompactParts builds
+           a part dict on the fly, so code that only looks at a handful of parts (like collating
+           the chosen ids) works with either form. compact_parts_from() fills one straight from a
+           streamed source without ever holding the decoded list.
+"""
+
+from array import array
+from pb_get_json import stream_json_from, iter_json_array, DEFAULT_CHUNK_SIZE
+
+# Typecode of the volume and value arrays
+ARRAY_TYPECODE = 'l'
+
+
+class CompactParts(object):
+    def __init__(self, ids=None, volumes=None, values=None):
+        """
+        Parts list held as parallel columns
+
+        :param ids: list of part ids
+        :param volumes: array of part volumes
+        :param values: array of part values
+        """
+        self.ids = ids if ids is not None else []
+        self.volumes = volumes if volumes is not None else array(ARRAY_TYPECODE)
+        self.values = values if values is not None else array(ARRAY_TYPECODE)
+
+    def append(self, part):
+        """
+        Adds a part dict of id, volume, and value fields to the end
+        """
+        self.ids.append(part['id'])
+        self.volumes.append(part['volume'])
+        self.values.append(part['value'])
+
+    def subset(self, indices, divisor=1):
+        """
+        New CompactParts holding the parts at indices, in that order, with volumes divided by divisor
+        """
+        return CompactParts([self.ids[index] for index in indices],
+                            array(ARRAY_TYPECODE, [self.volumes[index] // divisor for index in indices]),
+                            array(ARRAY_TYPECODE, [self.values[index] for index in indices]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CompactParts(self.ids[index], self.volumes[index], self.values[index])
+        return {'id': self.ids[index], 'volume': self.volumes[index], 'value': self.values[index]}
+
+    def __iter__(self):
+        for index in xrange(len(self.ids)):
+            yield self[index]
+
+
+def part_columns(parts):
+    """
+    Volume and value columns of a parts list, without copying a CompactParts
+
+    :param parts: CompactParts, or list of parts where each parts is a dict of id, volume, and value fields
+    :return: volumes, values
+    """
+    if isinstance(parts, CompactParts):
+        return parts.volumes, parts.values
+    return [part['volume'] for part in parts], [part['value'] for part in parts]
+
+
+def compact_parts_from(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Reads a json parts list into a CompactParts, decoding one part at a time as the source streams in
+
+    :param source: string path of file or http path for file
+    :param chunk_size: bytes read at a time
+    :return: CompactParts
+    """
+    parts = CompactParts()
+    for part in iter_json_array(stream_json_from(source, chunk_size=chunk_size)):
+        parts.append(part)
+    return parts
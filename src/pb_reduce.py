@@ -0,0 +1,128 @@
+"""
+    pb_reduce.py
+        Author: Theodore Enns
+        Brief: Cheap input reductions applied before solving knapsack 0-1.
+
+           Many parts can be decided without running the dp at all, and the volume axis can often
+           be shrunk. Every rule here only removes a part when no optimal packing uses it, and only
+           fixes a part when every optimal packing uses it, so the solver's tie-breaking over the
+           parts left is unchanged and the expanded answer is the one the full problem would give:
+             - parts larger than the suitcase, or with negative value, are excluded
+             - a part is excluded when the parts with no more volume and strictly more value could
+               not all be packed alongside it (one of them can always be swapped in)
+             - if everything left fits, everything left is fixed
+             - the volume axis is divided by the gcd of the part volumes left
+           Zero volume parts are special in pick_items_dp() (they are never taken once no space is
+           left), so when any are present only the oversized parts are excluded.
+"""
+
+from fractions import gcd
+from pb_parts import CompactParts, part_columns
+
+
+class KnapSack01Reduction(object):
+    def __init__(self, parts, volume):
+        """
+        Reduces a knapsack 0-1 problem. The reduced problem is given by self.parts and self.volume;
+            expand() maps a solution of it back onto the original parts list.
+
+        :param parts: list of parts where each parts is a dict of id, volume, and value fields, or a
+            pb_parts.CompactParts (self.parts is then one too)
+        :param volume: positive integer for maximum capacity of knapsack
+        """
+        self.original_parts = parts
+        self.original_volume = volume
+        self.original_volumes, self.original_values = volumes, values = part_columns(parts)
+        self.excluded = []
+        self.forced = []
+        self.scale = 1
+
+        candidates = []
+        for index, part_volume in enumerate(volumes):
+            if part_volume > volume:
+                self.excluded.append(index)
+            else:
+                candidates.append(index)
+
+        if all(volumes[index] > 0 for index in candidates):
+            candidates = self._exclude_dominated(candidates, volume)
+            if sum(volumes[index] for index in candidates) <= volume:
+                self.forced = candidates
+                candidates = []
+            common_divisor = 0
+            for index in candidates:
+                common_divisor = gcd(common_divisor, volumes[index])
+            self.scale = max(common_divisor, 1)
+        self.excluded.sort()
+
+        # Free parts keep their relative order, which the solver's tie-breaking depends on
+        self.index_map = candidates
+        self.volume = (volume - sum(volumes[index] for index in self.forced)) // self.scale
+        if isinstance(parts, CompactParts):
+            self.parts = parts.subset(candidates, self.scale)
+        else:
+            self.parts = [dict(parts[index], volume=volumes[index] // self.scale) for index in candidates]
+
+    def _exclude_dominated(self, candidates, volume):
+        """
+        Drops parts with negative value, and parts dominated by more strictly better parts than
+            could fit alongside them. Parts are visited by volume, with a Fenwick tree over value
+            ranks summing the volume of the parts seen so far that are worth more.
+
+        :return: the candidates left, in their original order
+        """
+        volumes, values = self.original_volumes, self.original_values
+        ranked_values = sorted(set(values[index] for index in candidates))
+        rank_of = dict((value, rank + 1) for rank, value in enumerate(ranked_values))
+        tree = [0] * (len(ranked_values) + 1)
+        seen_volume = 0
+        keep = set()
+        by_volume = sorted(candidates, key=lambda index: volumes[index])
+        start = 0
+        while start < len(by_volume):
+            # Parts of equal volume may dominate each other, so the whole group goes in first
+            group_volume = volumes[by_volume[start]]
+            end = start
+            while end < len(by_volume) and volumes[by_volume[end]] == group_volume:
+                rank = rank_of[values[by_volume[end]]]
+                seen_volume += group_volume
+                while rank < len(tree):
+                    tree[rank] += group_volume
+                    rank += rank & -rank
+                end += 1
+            for index in by_volume[start:end]:
+                # Volume of the parts seen with no more volume and a value no greater than this one
+                rank = rank_of[values[index]]
+                not_better_volume = 0
+                while rank > 0:
+                    not_better_volume += tree[rank]
+                    rank -= rank & -rank
+                dominating_volume = seen_volume - not_better_volume
+                if values[index] >= 0 and group_volume + dominating_volume <= volume:
+                    keep.add(index)
+                else:
+                    self.excluded.append(index)
+            start = end
+        return [index for index in candidates if index in keep]
+
+    def cells(self):
+        """
+        Effective dp size (parts times volume columns) of the original and reduced problems
+
+        :return: original_cells, reduced_cells
+        """
+        return (len(self.original_parts) * (self.original_volume + 1),
+                len(self.parts) * (self.volume + 1))
+
+    def expand(self, total_value, indices):
+        """
+        Maps a solution of the reduced problem back onto the original parts list
+
+        :param total_value: value achieved on the reduced problem
+        :param indices: indices into self.parts
+        :return: total_value, index_list for the original parts list
+        """
+        chosen = [self.index_map[index] for index in indices] + self.forced
+        chosen.sort()
+        total_value += sum(self.original_values[index] for index in self.forced)
+        return total_value, chosen
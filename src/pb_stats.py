@@ -0,0 +1,147 @@
+"""
+    pb_stats.py
+        Author: Theodore Enns
+        Brief: Phase timing and counters for a pack run.
+
+           When a run is slow, the time may have gone to fetching, parsing, solving or collating.
+           RunStats times named phases (wall and CPU seconds, and the process's peak resident
+           memory once each ends), keeps counters such as bytes fetched and dp cells evaluated,
+           and can profile chosen phases with cProfile. Fetches report their size through
+           pb_get_json.set_fetch_observer(), and solvers count their work in solver.cells (dp cells
+           evaluated) and solver.nodes (subsets or search nodes), which record_solver() copies in
+           along with the CPU utilization of the parallel engine.
+           report() returns everything as a json-ready dict.
+"""
+
+import cProfile
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Not available on Windows; peak memory is then left out
+
+
+def peak_memory_kb(usage=None):
+    """
+    Peak resident memory in KB (ru_maxrss is in bytes on OS X)
+
+    :param usage: resource usage struct, or None for this process's
+    :return: KB, or None where the resource module is unavailable
+    """
+    if usage is None:
+        if resource is None:
+            return None
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+    if sys.platform == 'darwin':
+        return usage.ru_maxrss // 1024
+    return usage.ru_maxrss
+
+
+def cpu_seconds():
+    """
+    User plus system CPU seconds used by this process so far
+    """
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+    times = os.times()  # Only counts in clock ticks
+    return times[0] + times[1]
+
+
+class RunStats(object):
+    def __init__(self, profile_phases=()):
+        """
+        Collects phase timings and counters for one run. Safe to count from several threads.
+
+        :param profile_phases: names of the phases to run under cProfile
+        """
+        self.phases = []
+        self.counters = {}
+        self.engine = None
+        self.cpu_utilization = None
+        self.profile_phases = set(profile_phases)
+        self.profiler = cProfile.Profile() if self.profile_phases else None
+        self._start = time.time()
+        self._start_cpu = cpu_seconds()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times the enclosed block as phase name (a repeated name adds up with the earlier entries in report())
+
+        :param name: string phase name
+        """
+        profiling = self.profiler is not None and name in self.profile_phases
+        start = time.time()
+        start_cpu = cpu_seconds()
+        if profiling:
+            self.profiler.enable()
+        try:
+            yield
+        finally:
+            if profiling:
+                self.profiler.disable()
+            self.phases.append({"name": name, "wall_s": time.time() - start, "cpu_s": cpu_seconds() - start_cpu,
+                                "peak_rss_kb": peak_memory_kb()})
+
+    def count(self, name, amount=1):
+        """
+        Adds amount to counter name
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def fetched(self, source, byte_count):
+        """
+        Fetch observer (see pb_get_json.set_fetch_observer) counting bytes_fetched
+        """
+        self.count('bytes_fetched', byte_count)
+
+    def record_solver(self, solver):
+        """
+        Copies the engine run, the work counted by a solver and its CPU utilization if it ran in
+            parallel
+        """
+        self.engine = solver.engine
+        self.cpu_utilization = solver.cpu_utilization
+        self.count('cells', solver.cells)
+        self.count('nodes', solver.nodes)
+
+    def dump_profile(self, path):
+        """
+        Writes the cProfile statistics of the profiled phases to path, for pstats or snakeviz
+        """
+        self.profiler.dump_stats(path)
+
+    def report(self):
+        """
+        Returns the timings and counters as a json-ready dict, phases in the order they ran. Every
+            counter is a field of its own; bytes_fetched, cells and nodes are always there,
+            cpu_utilization only after a parallel solve.
+        """
+        phases = []
+        by_name = {}
+        for entry in self.phases:
+            if entry['name'] in by_name:
+                merged = by_name[entry['name']]
+                merged['wall_s'] += entry['wall_s']
+                merged['cpu_s'] += entry['cpu_s']
+                merged['peak_rss_kb'] = entry['peak_rss_kb']
+            else:
+                by_name[entry['name']] = dict(entry)
+                phases.append(by_name[entry['name']])
+        report = {"bytes_fetched": 0, "cells": 0, "nodes": 0}
+        with self._lock:
+            report.update(self.counters)
+        report.update({"phases": phases, "wall_s": time.time() - self._start,
+                       "cpu_s": cpu_seconds() - self._start_cpu, "peak_rss_kb": peak_memory_kb(),
+                       "engine": self.engine})
+        if self.cpu_utilization is not None:
+            report["cpu_utilization"] = self.cpu_utilization
+        return report
@@ -0,0 +1,90 @@
+import json
+import subprocess
+import sys
+import unittest
+from StringIO import StringIO
+
+from src import pack_batch
+from src.pack_sources import *
+
+
+class TestBatchInterface(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_read_manifest(self):
+        """
+        Verifies both manifest formats, a json list and a jsonl stream, give the same entries
+        """
+        entries = [{"suitcase_source": file_suitcase, "parts_source": file_parts},
+                   {"suitcase_source": file_suitcase, "parts_source": "missing.json"}]
+        self.assertEqual(entries, list(pack_batch.read_manifest(StringIO(json.dumps(entries, indent=4)))))
+        stream = StringIO('\n'.join(json.dumps(entry) for entry in entries) + '\n\n')
+        self.assertEqual(entries, list(pack_batch.read_manifest(stream)))
+
+    def test_results_match_pack_bot(self):
+        """
+        Runs a jsonl manifest through pack_batch.py on a process pool and checks each line, in order,
+          matches what pack_bot.py prints for the same pair (or reports an error for a bad source).
+        """
+        command = [sys.executable, 'src/pack_bot.py', file_suitcase, file_parts]
+        expected_result = json.loads(subprocess.Popen(command, stdout=subprocess.PIPE).communicate()[0])
+
+        entry = json.dumps({"suitcase_source": file_suitcase, "parts_source": file_parts})
+        bad_entry = json.dumps({"suitcase_source": file_suitcase, "parts_source": "missing.json"})
+        manifest = '\n'.join([entry, entry, bad_entry, entry]) + '\n'
+        command = [sys.executable, 'src/pack_batch.py', '--workers', '2', '--chunksize', '1', '-']
+        output = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE).communicate(manifest)[0]
+        results = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(4, len(results))
+        self.assertEqual([expected_result] * 2, results[:2])
+        self.assertIn("error", results[2])
+        self.assertEqual(expected_result, results[3])
+
+    def test_malformed_line(self):
+        """
+        Verifies a manifest line that is not json gets an error line of its own, and the entries on
+          either side are still solved, in order
+        """
+        command = [sys.executable, 'src/pack_bot.py', file_suitcase, file_parts]
+        expected_result = json.loads(subprocess.Popen(command, stdout=subprocess.PIPE).communicate()[0])
+
+        entry = json.dumps({"suitcase_source": file_suitcase, "parts_source": file_parts})
+        manifest = '\n'.join([entry, 'not json', entry]) + '\n'
+        command = [sys.executable, 'src/pack_batch.py', '--workers', '2', '-']
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        output = process.communicate(manifest)[0]
+        self.assertEqual(0, process.returncode)
+        results = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(3, len(results))
+        self.assertEqual(expected_result, results[0])
+        self.assertIn("error", results[1])
+        self.assertEqual(expected_result, results[2])
+
+    def test_incomplete_entries(self):
+        """
+        Verifies entries missing a source, or not objects at all, get the same error lines with and
+          without prefetching, and the entries after them are still solved
+        """
+        command = [sys.executable, 'src/pack_bot.py', file_suitcase, file_parts]
+        expected_result = json.loads(subprocess.Popen(command, stdout=subprocess.PIPE).communicate()[0])
+
+        entry = json.dumps({"suitcase_source": file_suitcase, "parts_source": file_parts})
+        manifest = '\n'.join([json.dumps({"suitcase_source": file_suitcase}), entry, '[1, 2]', 'not json',
+                               entry]) + '\n'
+        outputs = []
+        for options in ([], ['--prefetch', '4']):
+            command = [sys.executable, 'src/pack_batch.py', '--workers', '2'] + options + ['-']
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            outputs.append(process.communicate(manifest)[0])
+            self.assertEqual(0, process.returncode)
+        self.assertEqual(outputs[0], outputs[1])
+        results = [json.loads(line) for line in outputs[1].splitlines()]
+        self.assertEqual(5, len(results))
+        for index in (0, 2, 3):
+            self.assertIn("error", results[index])
+        self.assertEqual([expected_result] * 2, [results[1], results[4]])
+
+
+if __name__ == '__main__':
+    unittest.main()
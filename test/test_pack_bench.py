@@ -0,0 +1,71 @@
+import json
+import subprocess
+import sys
+import unittest
+
+from src import pack_bench
+from src.pb_knapsack import KnapSack01Solver
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_generators(self):
+        """
+        Verifies the problems are reproducible from their seed and each kind relates values to volumes as described
+        """
+        for kind in ('uncorrelated', 'weakly_correlated', 'strongly_correlated', 'subset_sum'):
+            suitcase, parts = pack_bench.generate_problem(kind, 50, 100, 0.5, 7)
+            self.assertEqual((suitcase, parts), pack_bench.generate_problem(kind, 50, 100, 0.5, 7))
+            self.assertNotEqual(parts, pack_bench.generate_problem(kind, 50, 100, 0.5, 8)[1])
+            self.assertEqual(sum(part['volume'] for part in parts) // 2, suitcase['volume'])
+            for part in parts:
+                self.assertTrue(1 <= part['volume'] <= 100)
+                if kind == 'weakly_correlated':
+                    self.assertTrue(max(1, part['volume'] - 10) <= part['value'] <= part['volume'] + 10)
+                elif kind == 'strongly_correlated':
+                    self.assertEqual(part['volume'] + 10, part['value'])
+                elif kind == 'subset_sum':
+                    self.assertEqual(part['volume'], part['value'])
+        self.assertRaises(ValueError, pack_bench.generate_problem, 'unknown', 5, 10, 0.5, 1)
+
+    def test_small_run(self):
+        """
+        Runs every scenario shrunk down and checks each case finished with the optimal value, and that a run
+            compares cleanly against itself
+        """
+        results = pack_bench.run_benchmarks(scale=0.01, timeout=60)
+        self.assertTrue(results)
+        for result in results:
+            self.assertEqual('ok', result['status'])
+            scenario = [entry for entry in pack_bench.SCENARIOS if entry[0] == result['scenario']][0]
+            suitcase, parts = pack_bench.generate_problem(scenario[1], result['parts'], scenario[3], scenario[4],
+                                                          pack_bench.DEFAULT_SEED)
+            self.assertEqual(KnapSack01Solver(parts, suitcase['volume']).solve('bnb')[0], result['value'])
+            self.assertTrue(result['wall_s'] >= 0)
+            if result['engine'] == 'parallel':
+                serial = [entry for entry in results if entry['scenario'] == result['scenario']
+                          and entry['suite'] == 'solver' and entry['engine'] == 'numpy'][0]
+                self.assertEqual(serial['wall_s'] / result['wall_s'], result['speedup'])
+                self.assertIn('cpu_utilization', result)
+        self.assertEqual(set(['solver', 'pack_bot']), set(result['suite'] for result in results))
+        comparisons = pack_bench.compare_results(results, results, 0.25)
+        self.assertEqual(len(results), len(comparisons))
+        self.assertFalse(any(regressed for name, before, after, ratio, regressed in comparisons))
+
+    def test_command_line(self):
+        """
+        Checks pack_bench.py writes a json report naming the environment it ran in
+        """
+        command = [sys.executable, 'src/pack_bench.py', '--scale', '0.01', '--scenarios', 'server',
+                   '--engines', 'bits', 'auto']
+        output = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE).communicate()[0]
+        report = json.loads(output)
+        self.assertEqual(set(['environment', 'settings', 'results']), set(report))
+        self.assertEqual([('solver', 'bits'), ('solver', 'auto'), ('pack_bot', 'auto')],
+                         [(result['suite'], result['engine']) for result in report['results']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,13 @@
 import json
+import os
+import pstats
 import subprocess
 import sys
+import tempfile
 import unittest
 
 from src.pack_sources import *
+from src.pb_get_json import grab_dict_from
 
 
 class TestExecutableInterface(unittest.TestCase):
@@ -74,3 +78,45 @@ class TestExecutableInterface(unittest.TestCase):
             "value": 1163
         }
         self.assertDictEqual(result, expected_result, "pack_bot.py failed to produce valid json known regression files")
+
+    def test_streamed_parts(self):
+        """
+        Verifies parsing the parts list into compact arrays as it streams in prints the same output
+        """
+        command = [sys.executable, 'src/pack_bot.py', file_suitcase, file_parts]
+        expected_output = subprocess.Popen(command, stdout=subprocess.PIPE).communicate()[0]
+        command.insert(2, '--stream')
+        output = subprocess.Popen(command, stdout=subprocess.PIPE).communicate()[0]
+        self.assertEqual(expected_output, output)
+
+    def test_several_suitcases(self):
+        """
+        Verifies several suitcases extend the output with the parts and value packed in each
+        """
+        command = [sys.executable, 'src/pack_bot.py', file_suitcase, file_suitcase, file_parts]
+        result = json.loads(subprocess.Popen(command, stdout=subprocess.PIPE).communicate()[0])
+        self.assertEqual(2, len(result['suitcases']))
+        self.assertEqual(result['value'], sum(suitcase['value'] for suitcase in result['suitcases']))
+        packed_ids = [part_id for suitcase in result['suitcases'] for part_id in suitcase['part_ids'] or []]
+        self.assertEqual(sorted(result['part_ids']), sorted(packed_ids))
+
+    def test_stats(self):
+        """
+        Verifies --stats leaves the output alone and reports every phase and the work done on stderr,
+          and --profile dumps loadable cProfile statistics
+        """
+        command = [sys.executable, 'src/pack_bot.py', file_suitcase, file_parts]
+        expected_output = subprocess.Popen(command, stdout=subprocess.PIPE).communicate()[0]
+        profile_path = tempfile.mktemp()
+        command[2:2] = ['--stats', '--stream', '--profile', profile_path]
+        output, errors = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE).communicate()
+        self.assertEqual(expected_output, output)
+        report = json.loads(errors)
+        self.assertEqual(['fetch', 'solve', 'collate', 'output'], [phase['name'] for phase in report['phases']])
+        self.assertEqual(os.path.getsize(file_suitcase) + os.path.getsize(file_parts), report['bytes_fetched'])
+        self.assertEqual(len(grab_dict_from(file_parts)) * grab_dict_from(file_suitcase)['volume'], report['cells'])
+        self.assertEqual('dp', report['engine'])
+        try:
+            self.assertTrue(any(function[2] == 'pick_items_dp' for function in pstats.Stats(profile_path).stats))
+        finally:
+            os.remove(profile_path)
@@ -0,0 +1,80 @@
+import httplib
+import json
+import subprocess
+import sys
+import threading
+import unittest
+
+from src.pack_service import PackService, PackServer, is_loopback
+from src.pack_sources import *
+
+
+class TestServiceInterface(unittest.TestCase):
+    def setUp(self):
+        self.service = PackService(workers=1)
+        self.server = PackServer(self.service, port=0)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.connection = httplib.HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=30)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.close()
+
+    def request(self, method, path, body=None):
+        self.connection.request(method, path, body)
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def test_results_match_pack_bot(self):
+        """
+        Verifies the service answers, over one keep-alive connection, exactly what pack_bot.py prints,
+          solving the first request in a worker and serving the repeat from the solution cache
+        """
+        command = [sys.executable, 'src/pack_bot.py', file_suitcase, file_parts]
+        expected_output = subprocess.Popen(command, stdout=subprocess.PIPE).communicate()[0].replace('\r\n', '\n')
+
+        request = json.dumps({"suitcase_source": file_suitcase, "parts_source": file_parts})
+        self.assertEqual((200, expected_output), self.request('POST', '/solve', request))
+        self.assertEqual((200, expected_output), self.request('POST', '/solve', request))
+        status = json.loads(self.request('GET', '/status')[1])
+        self.assertEqual((1, 1, 2), (status['memo_hits'], status['memo_misses'], status['served']))
+
+    def test_errors(self):
+        """
+        Verifies malformed requests, unreadable sources and a full queue are reported with their status
+        """
+        self.assertEqual(400, self.request('POST', '/solve', '{"parts_source": "parts.json"}')[0])
+        self.assertEqual(400, self.request('POST', '/solve', 'not json')[0])
+        self.assertEqual(404, self.request('GET', '/solve')[0])
+        request = json.dumps({"suitcase_source": file_suitcase, "parts_source": "missing.json"})
+        status, body = self.request('POST', '/solve', request)
+        self.assertEqual(502, status)
+        self.assertIn("error", json.loads(body))
+
+        self.service.max_queue = 0
+        request = json.dumps({"suitcase_source": file_suitcase, "parts_source": file_parts})
+        self.assertEqual(503, self.request('POST', '/solve', request)[0])
+        self.assertEqual(1, json.loads(self.request('GET', '/status')[1])['rejected'])
+
+    def test_http_only(self):
+        """
+        Verifies a service open to other machines refuses file sources, and which hosts count as local
+        """
+        self.service.http_only = True
+        request = json.dumps({"suitcase_source": file_suitcase, "parts_source": file_parts})
+        status, body = self.request('POST', '/solve', request)
+        self.assertEqual(403, status)
+        self.assertIn("error", json.loads(body))
+        self.assertEqual(0, json.loads(self.request('GET', '/status')[1])['served'])
+        self.assertTrue(is_loopback('127.0.0.1'))
+        self.assertTrue(is_loopback('localhost'))
+        self.assertFalse(is_loopback('0.0.0.0'))
+        self.assertFalse(is_loopback(''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from src import pb_get_json
+from src.pack_sources import *
+from src.pb_cache import HttpCache
+from test.test_pb_get_json import StandInServer
+
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer()
+        self.pool = pb_get_json.ConnectionPool(timeout=5)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        pb_get_json.set_default_cache(None)
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_revalidation(self):
+        """
+        Verifies a cached body is revalidated with a conditional request and not downloaded again
+        """
+        cache = HttpCache(self.directory)
+        url = self.server.url + '/robots/hey-you/parts'
+        expected_data = pb_get_json.file_fetch_json(file_parts)
+        self.assertEqual(expected_data, cache.fetch(url, self.pool))
+        self.assertEqual(expected_data, cache.fetch(url, self.pool))
+        self.assertEqual(2, len(self.server.requests))
+        self.assertEqual(1, self.server.not_modified)
+        self.assertEqual((0, 1, 1), (cache.hits, cache.revalidated, cache.misses))
+        self.assertEqual(len(expected_data), cache.size())
+
+    def test_max_age(self):
+        """
+        Verifies a fresh enough entry is served without any request, including through grab_dict_from
+        """
+        pb_get_json.set_default_cache(HttpCache(self.directory, max_age=60))
+        url = self.server.url + '/suitcases/rolly'
+        for trial in range(3):
+            self.assertEqual(1584, pb_get_json.grab_dict_from(url)['volume'])
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_eviction(self):
+        """
+        Verifies the least recently used entry is evicted once the cache outgrows max_bytes
+        """
+        parts_size = len(pb_get_json.file_fetch_json(file_parts))
+        cache = HttpCache(self.directory, max_bytes=parts_size + 100)
+        cache.fetch(self.server.url + '/suitcases/rolly', self.pool)
+        cache.fetch(self.server.url + '/robots/hey-you/parts', self.pool)
+        self.assertEqual(4, len(os.listdir(self.directory)))
+        cache.fetch(self.server.url + '/robots/other/parts', self.pool)
+        self.assertEqual(parts_size, cache.size())
+        self.assertEqual(2, len(os.listdir(self.directory)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,72 @@
+import threading
 import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
 
 from src import pb_get_json
 from src.pack_sources import *
 
 
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves the test json files over keep-alive http/1.1 with an ETag, answering 503 to the first
+        request for any path starting with /flaky, redirecting /moved/<path> to /<path> and /loop
+        to itself
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path.startswith('/flaky') and self.server.requests.count(self.path) == 1:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith('/moved/') or self.path == '/loop':
+            self.send_response(301 if self.path != '/loop' else 302)
+            self.send_header('Location', self.path[len('/moved'):] if self.path != '/loop' else '/loop')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        path = file_parts if self.path.endswith('parts') else file_suitcase
+        with open(path, 'r') as json_file:
+            body = json_file.read()
+        etag = '"%s-%d"' % (path, len(body))
+        if self.headers.get('If-None-Match') == etag:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200 if self.path != '/missing' else 404)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+        self.connections = 0
+        self.not_modified = 0
+        self.requests = []
+        self.url = 'http://127.0.0.1:%d' % self.server_address[1]
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+
 class TestImportingInputSources(unittest.TestCase):
     def setUp(self):
         pass
@@ -27,6 +90,111 @@ class TestImportingInputSources(unittest.TestCase):
         self.assertEqual(len(result), 44)
         self.assertEqual(result[0]['id'], 'part-1')
 
+    def test_iter_json_array(self):
+        """
+        Verifies array elements are decoded one at a time however the json is split into chunks,
+            including numbers split across chunks, and malformed arrays are rejected
+        """
+        text = open(file_parts, 'r').read() + ' '
+        expected_result = pb_get_json.grab_dict_from(file_parts)
+        for chunk_size in (1, 2, 7, 64, len(text)):
+            chunks = [text[start:start + chunk_size] for start in range(0, len(text), chunk_size)]
+            self.assertEqual(expected_result, list(pb_get_json.iter_json_array(chunks)))
+        self.assertEqual([-3.5e10, [1, [2]], "x]", None], list(pb_get_json.iter_json_array(
+            ['[-3', '.5e', '10, [1,[2', ']], "x', ']" ,null', ']'])))
+        self.assertEqual([], list(pb_get_json.iter_json_array([' [ ', ' ] '])))
+        for text in ('', '{}', '[1, 2', '[1 2]', '[1,,2]'):
+            self.assertRaises(ValueError, list, pb_get_json.iter_json_array([text]))
+
+
+
+class TestPooledFetching(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer()
+        self.pool = pb_get_json.ConnectionPool(timeout=5, backoff=0.01, proxies={})
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reuse(self):
+        """
+        Verifies repeated fetches from one host share a single keep-alive connection
+        """
+        for trial in range(3):
+            data = pb_get_json.http_fetch_json(self.server.url + '/suitcases/rolly', self.pool)
+            self.assertIn('volume', data)
+            pb_get_json.http_fetch_json(self.server.url + '/robots/hey-you/parts', self.pool)
+        self.assertEqual(6, len(self.server.requests))
+        self.assertEqual(1, self.server.connections)
+        self.assertEqual(1, self.pool.connections_opened)
+
+    def test_fetch_many(self):
+        """
+        Verifies concurrent fetching returns the sources in order, mixing http and file sources
+        """
+        sources = [self.server.url + '/suitcases/rolly', self.server.url + '/robots/hey-you/parts', file_parts] * 4
+        results = pb_get_json.fetch_many(sources, concurrency=4, pool=self.pool)
+        expected_results = [pb_get_json.file_fetch_json(file_suitcase), pb_get_json.file_fetch_json(file_parts),
+                            pb_get_json.file_fetch_json(file_parts)] * 4
+        self.assertEqual(expected_results, results)
+        self.assertLessEqual(self.pool.connections_opened, 4)
+        results = pb_get_json.fetch_many([self.server.url + '/missing', file_suitcase], pool=self.pool,
+                                         return_errors=True)
+        self.assertIsInstance(results[0], Exception)
+        self.assertEqual(pb_get_json.file_fetch_json(file_suitcase), results[1])
+
+    def test_retry(self):
+        """
+        Verifies a 5xx answer is retried, and a 4xx answer is not
+        """
+        data = pb_get_json.http_fetch_json(self.server.url + '/flaky/parts', self.pool)
+        self.assertEqual(pb_get_json.file_fetch_json(file_parts), data)
+        self.assertEqual(2, self.server.requests.count('/flaky/parts'))
+        self.assertRaises(Exception, pb_get_json.http_fetch_json, self.server.url + '/missing', self.pool)
+        self.assertEqual(1, self.server.requests.count('/missing'))
+
+    def test_stream(self):
+        """
+        Verifies a streamed body arrives whole in small chunks (retrying a 5xx answer first), and the
+            connection is handed back for reuse once it has been read
+        """
+        chunks = list(pb_get_json.stream_json_from(self.server.url + '/flaky/parts', self.pool, chunk_size=100))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(pb_get_json.file_fetch_json(file_parts), ''.join(chunks))
+        pb_get_json.http_fetch_json(self.server.url + '/robots/hey-you/parts', self.pool)
+        self.assertEqual(2, self.pool.connections_opened)
+        self.assertRaises(Exception, list, pb_get_json.stream_json_from(self.server.url + '/missing', self.pool))
+
+    def test_redirect(self):
+        """
+        Verifies fetches and streams follow a redirect over the same connection, and give up on a
+            redirect loop after MAX_REDIRECTS hops
+        """
+        data = pb_get_json.http_fetch_json(self.server.url + '/moved/robots/hey-you/parts', self.pool)
+        self.assertEqual(pb_get_json.file_fetch_json(file_parts), data)
+        chunks = list(pb_get_json.stream_json_from(self.server.url + '/moved/suitcases/rolly', self.pool))
+        self.assertEqual(pb_get_json.file_fetch_json(file_suitcase), ''.join(chunks))
+        self.assertEqual(['/moved/robots/hey-you/parts', '/robots/hey-you/parts', '/moved/suitcases/rolly',
+                          '/suitcases/rolly'], self.server.requests)
+        self.assertEqual(1, self.pool.connections_opened)
+        self.assertRaises(Exception, pb_get_json.http_fetch_json, self.server.url + '/loop', self.pool)
+        self.assertEqual(pb_get_json.MAX_REDIRECTS + 1, self.server.requests.count('/loop'))
+        self.assertRaises(Exception, list, pb_get_json.stream_json_from(self.server.url + '/loop', self.pool))
+
+    def test_proxy(self):
+        """
+        Verifies an http url is requested in full from the proxy given for its scheme
+        """
+        proxied = pb_get_json.ConnectionPool(timeout=5, proxies={'http': self.server.url})
+        try:
+            data = pb_get_json.http_fetch_json('http://robots.invalid/robots/hey-you/parts', proxied)
+            self.assertEqual(pb_get_json.file_fetch_json(file_parts), data)
+            self.assertEqual(['http://robots.invalid/robots/hey-you/parts'], self.server.requests)
+        finally:
+            proxied.close()
+
 
 if __name__ == '__main__':
     unittest.main()
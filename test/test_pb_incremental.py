@@ -0,0 +1,60 @@
+import unittest
+from random import randint
+
+from src.pack_sources import *
+from src.pb_get_json import grab_dict_from
+from src.pb_incremental import IncrementalKnapSack01Solver
+from src.pb_knapsack import KnapSack01Solver
+from test.test_pb_knapsack import random_parts
+
+
+class TestIncrementalSolver(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def assert_matches_dp(self, solver, volumes):
+        for volume in volumes:
+            expected_result = KnapSack01Solver(solver.parts, volume).pick_items_dp()
+            self.assertEqual(expected_result[0], solver.value(volume))
+            self.assertEqual(expected_result, solver.pick_items(volume))
+
+    def test_regression_capacities(self):
+        """
+        Verifies every capacity up to the suitcase volume is answered from one table as a fresh dp would
+        """
+        suitcase = grab_dict_from(file_suitcase)
+        parts = grab_dict_from(file_parts)
+        solver = IncrementalKnapSack01Solver(parts, suitcase['volume'])
+        self.assertEqual(KnapSack01Solver(parts, suitcase['volume']).pick_items_dp(), solver.pick_items())
+        self.assert_matches_dp(solver, range(0, suitcase['volume'] + 1, 97))
+        self.assertEqual(len(parts), solver.rows_computed)
+
+    def test_random_updates(self):
+        """
+        Appends and removes random parts, small value ranges provoking ties, and checks every answer
+            against a fresh dp, including capacities above the original volume
+        """
+        for trial in range(20):
+            volume = randint(0, 60)
+            solver = IncrementalKnapSack01Solver(random_parts(randint(0, 12), 15, 6), volume,
+                                                 checkpoint_interval=randint(1, 5))
+            self.assert_matches_dp(solver, range(volume + 1))
+            for update in range(6):
+                if solver.num_options and randint(0, 1):
+                    index = randint(0, solver.num_options - 1)
+                    rows_computed = solver.rows_computed
+                    solver.remove_part(index)
+                    checkpoint = index // solver.checkpoint_interval * solver.checkpoint_interval
+                    self.assertEqual(rows_computed + solver.num_options - checkpoint, solver.rows_computed)
+                else:
+                    rows_computed = solver.rows_computed
+                    added_parts = random_parts(randint(1, 4), 15, 6)
+                    solver.add_parts(added_parts)
+                    self.assertEqual(rows_computed + len(added_parts), solver.rows_computed)
+                self.assert_matches_dp(solver, [0, volume // 2, volume])
+            self.assert_matches_dp(solver, [volume + 10])
+            self.assertEqual(volume + 10, solver.max_volume)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,22 @@
+import random
 import unittest
 from random import randint
 
 from src.pack_sources import *
 from src.pb_get_json import grab_dict_from
+from src import pb_knapsack
 from src.pb_knapsack import KnapSack01Solver
 
 
+def random_parts(count, max_volume, max_value, min_volume=0, rng=random):
+    """
+    Builds a random parts list; small value ranges are used by callers to provoke ties. Pass a
+        random.Random as rng for a reproducible list.
+    """
+    return [{"id": "part-%d" % (index + 1), "volume": rng.randint(min_volume, max_volume),
+             "value": rng.randint(0, max_value)} for index in range(count)]
+
+
 class KnapSack01SolverExtended(KnapSack01Solver):
     def pick_items_brute_force(self):
         """
@@ -141,5 +152,169 @@ class TestKnapSackSolver(unittest.TestCase):
         print 'Suitcase: ', suitcase['volume'], '\nUsed space: ', total_volume, '\n'
 
 
+    def assert_engine_matches_dp(self, engine, trials=50, min_volume=0, regression=True):
+        """
+        Verifies the named engine reproduces pick_items_dp() exactly on the regression files and on
+            random inputs, including which parts are taken when several solutions tie.
+        """
+        if regression:
+            suitcase = grab_dict_from(file_suitcase)
+            parts = grab_dict_from(file_parts)
+            solver = KnapSack01Solver(parts, suitcase['volume'])
+            self.assertEqual(solver.pick_items_dp(), solver.solve(engine))
+        for trial in range(trials):
+            parts = random_parts(randint(0, 12), 20, 5, min_volume)
+            solver = KnapSack01Solver(parts, randint(0, 60))
+            self.assertEqual(solver.pick_items_dp(), solver.solve(engine),
+                             "%s engine differs from dp for %s" % (engine, parts))
+
+    @unittest.skipIf(pb_knapsack.numpy is None, "numpy is not installed")
+    def test_numpy_engine_matches_dp(self):
+        self.assert_engine_matches_dp('numpy')
+
+    def test_bits_engine_matches_dp(self):
+        self.assert_engine_matches_dp('bits')
+
+    def test_hirschberg_engine_matches_dp(self):
+        self.assert_engine_matches_dp('hirschberg')
+
+    def test_mitm_engine_matches_dp(self):
+        # 44 parts means 2^22 subsets per half, too slow for the regression files
+        self.assert_engine_matches_dp('mitm', min_volume=1, regression=False)
+
+    def test_bnb_engine_matches_dp(self):
+        self.assert_engine_matches_dp('bnb', min_volume=1)
+
+    @unittest.skipIf(pb_knapsack.numpy is None, "numpy is not installed")
+    def test_parallel_engine_matches_dp(self):
+        """
+            test_parallel_engine_matches_dp() also splits the rows into as many as seven bands, some of them
+                narrower than the parts, and checks the result is exactly the numpy engine's on larger inputs.
+        """
+        self.assert_engine_matches_dp('parallel')
+        for trial in range(100):
+            parts = random_parts(randint(0, 12), 40, 5)
+            solver = KnapSack01Solver(parts, randint(0, 200), threads=randint(1, 7))
+            self.assertEqual(solver.pick_items_dp(), solver.solve('parallel'),
+                             "parallel engine differs from dp for %s" % parts)
+        parts = random_parts(40, 3000, 6, 1)
+        expected_result = KnapSack01Solver(parts, 30000).solve('numpy')
+        for threads in (2, 3, 7):
+            solver = KnapSack01Solver(parts, 30000, threads=threads)
+            self.assertEqual(expected_result, solver.solve('parallel'))
+            self.assertGreater(solver.cpu_utilization, 0)
+            self.assertLessEqual(solver.cpu_utilization, threads * 1.5)
+
+    def test_core_engine_matches_dp(self):
+        """
+            test_core_engine_matches_dp() also checks the core engine against the bits engine on larger
+                weakly correlated inputs, where it never evaluates more cells. How many fewer varies
+                widely on this family (from a thousandth of the table to half of it), so no larger
+                saving is asserted.
+        """
+        self.assert_engine_matches_dp('core', trials=300)
+        rng = random.Random(17)
+        for trial in range(10):
+            parts = random_parts(200, 100, 20, 1, rng)
+            for part in parts:
+                part['value'] = max(1, part['volume'] + part['value'] - 10)
+            volume = sum(part['volume'] for part in parts) // 2
+            solver = KnapSack01Solver(parts, volume)
+            expected_result = solver.solve('bits')
+            bits_cells = solver.cells
+            solver = KnapSack01Solver(parts, volume)
+            self.assertEqual(expected_result, solver.solve('core'))
+            self.assertLessEqual(solver.cells, bits_cells)
+
+    def test_sparse_engine_matches_dp(self):
+        """
+            test_sparse_engine_matches_dp() also checks the sparse engine against meet-in-the-middle for
+                huge volumes drawn from a few sizes with small values, so that many packings tie.
+        """
+        self.assert_engine_matches_dp('sparse', trials=300)
+        for trial in range(50):
+            parts = random_parts(randint(1, 16), 3, 4, 1)
+            for part in parts:
+                part['volume'] = part['volume'] * 10 ** 7 + randint(0, 1)
+            volume = randint(0, 2 * 10 ** 8)
+            self.assertEqual(KnapSack01Solver(parts, volume).solve('mitm'),
+                             KnapSack01Solver(parts, volume).solve('sparse'),
+                             "sparse engine differs from mitm for %s" % parts)
+
+    def test_auto_engine_selection(self):
+        """
+            test_auto_engine_selection() checks the dispatcher picks a volume independent engine for a few
+                parts in a huge suitcase, the cheapest engine by estimate_costs() for the regression files
+                (the numpy table engine when numpy is installed), and that its answer always matches
+                pick_items_dp().
+        """
+        parts = random_parts(16, 10 ** 8, 1000, 1)
+        solver = KnapSack01Solver(parts, 4 * 10 ** 8)
+        total_value, indices = solver.solve('auto')
+        self.assertIn(solver.engine, ('mitm', 'bnb'))
+        self.assertEqual(total_value, sum(parts[index]['value'] for index in indices))
+        self.assertLessEqual(sum(parts[index]['volume'] for index in indices), 4 * 10 ** 8)
+
+        suitcase = grab_dict_from(file_suitcase)
+        parts = grab_dict_from(file_parts)
+        solver = KnapSack01Solver(parts, suitcase['volume'])
+        self.assertEqual(solver.pick_items_dp(), solver.solve('auto'))
+        costs = solver.estimate_costs()
+        self.assertEqual(min(costs.values()), costs[solver.engine])
+        self.assertEqual(solver.choose_engine(), solver.engine)
+        if pb_knapsack.numpy is not None:
+            self.assertEqual('numpy', solver.engine)
+        self.assert_engine_matches_dp('auto')
+
+    def test_fptas_guarantee(self):
+        """
+            test_fptas_guarantee() checks the fptas engine reaches (1 - epsilon) of the optimum, fits the
+                suitcase, and reports an upper bound no lower than the optimum.
+        """
+        for trial in range(50):
+            parts = random_parts(randint(0, 12), 20, 100)
+            epsilon = randint(1, 9) / 10.0
+            solver = KnapSack01Solver(parts, randint(0, 60), epsilon=epsilon)
+            optimal_value = solver.pick_items_dp()[0]
+            total_value, indices = solver.solve('fptas')
+            self.assertEqual(total_value, sum(parts[index]['value'] for index in indices))
+            self.assertLessEqual(sum(parts[index]['volume'] for index in indices), solver.max_volume)
+            self.assertGreaterEqual(total_value, (1 - epsilon) * optimal_value)
+            self.assertGreaterEqual(solver.upper_bound, optimal_value)
+
+    def test_anytime_bounds(self):
+        """
+            test_anytime_bounds() checks the anytime engine returns a feasible packing and a valid upper
+                bound when stopped immediately, and the dp answer when given no deadline.
+        """
+        suitcase = grab_dict_from(file_suitcase)
+        parts = grab_dict_from(file_parts)
+        solver = KnapSack01Solver(parts, suitcase['volume'], deadline_ms=0)
+        total_value, indices = solver.solve('anytime')
+        self.assertEqual(total_value, sum(parts[index]['value'] for index in indices))
+        self.assertLessEqual(sum(parts[index]['volume'] for index in indices), suitcase['volume'])
+        self.assertGreaterEqual(solver.upper_bound, 1163)
+        solver.deadline_ms = None
+        self.assertEqual(solver.pick_items_dp(), solver.solve('anytime'))
+        self.assertEqual(1163, solver.upper_bound)
+
+    def test_hirschberg_over_memory_budget(self):
+        """
+            test_hirschberg_over_memory_budget() shrinks the memory budget so the table engines must hand
+                over to the hirschberg engine, and so that it recurses down to single parts.
+        """
+        suitcase = grab_dict_from(file_suitcase)
+        parts = grab_dict_from(file_parts)
+        solver = KnapSack01Solver(parts, suitcase['volume'], memory_budget=0)
+        expected_result = solver.pick_items_dp()
+        self.assertEqual(expected_result, solver.solve('bits'))
+        self.assertEqual('hirschberg', solver.engine)
+        for trial in range(50):
+            parts = random_parts(randint(0, 12), 20, 5)
+            solver = KnapSack01Solver(parts, randint(0, 60), memory_budget=randint(0, 16))
+            self.assertEqual(solver.pick_items_dp(), solver.pick_items_hirschberg(),
+                             "hirschberg engine differs from dp for %s" % parts)
+
+
 if __name__ == '__main__':
     unittest.main()
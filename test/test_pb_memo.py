@@ -0,0 +1,95 @@
+import shutil
+import tempfile
+import unittest
+from random import shuffle
+
+from src.pack_sources import *
+from src.pb_get_json import grab_dict_from
+from src.pb_knapsack import KnapSack01Solver
+from src.pb_memo import SolutionCache
+
+
+class TestSolutionCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_same_problem(self):
+        """
+        Verifies a repeated problem is served from memory, and from disk by a fresh cache
+        """
+        suitcase = grab_dict_from(file_suitcase)
+        parts = grab_dict_from(file_parts)
+        memo = SolutionCache(directory=self.directory)
+        expected_result = KnapSack01Solver(parts, suitcase['volume']).pick_items_dp()
+        self.assertEqual(expected_result, memo.solve(KnapSack01Solver(parts, suitcase['volume'])))
+        solver = KnapSack01Solver(parts, suitcase['volume'])
+        self.assertEqual(expected_result, memo.solve(solver))
+        self.assertEqual('memo', solver.engine)
+        self.assertEqual((1, 1), (memo.hits, memo.misses))
+
+        memo = SolutionCache(directory=self.directory)
+        self.assertEqual(expected_result, memo.solve(KnapSack01Solver(parts, suitcase['volume'])))
+        self.assertEqual((1, 0), (memo.hits, memo.misses))
+
+    def test_relabelled_problem(self):
+        """
+        Verifies a hit for renamed parts matches a fresh solve exactly, and reordered parts are solved
+            afresh rather than mapped onto the stored packing
+        """
+        suitcase = grab_dict_from(file_suitcase)
+        parts = grab_dict_from(file_parts)
+        memo = SolutionCache(max_entries=1)
+        memo.solve(KnapSack01Solver(parts, suitcase['volume']), 'bits')
+        relabelled_parts = [dict(part, id='other-' + part['id']) for part in parts]
+        solver = KnapSack01Solver(relabelled_parts, suitcase['volume'])
+        self.assertEqual(solver.pick_items_dp(), memo.solve(solver))
+        self.assertEqual('memo', solver.engine)
+        self.assertEqual((1, 1), (memo.hits, memo.misses))
+        for trial in range(5):
+            shuffle(relabelled_parts)
+            solver = KnapSack01Solver(relabelled_parts, suitcase['volume'])
+            self.assertEqual(solver.pick_items_dp(), memo.solve(solver))
+
+        # A different capacity is a different problem, and pushes the last one out of memory
+        memo = SolutionCache(max_entries=1)
+        memo.solve(KnapSack01Solver(parts, suitcase['volume']))
+        memo.solve(KnapSack01Solver(parts, suitcase['volume'] - 1))
+        memo.solve(KnapSack01Solver(parts, suitcase['volume']))
+        self.assertEqual((0, 3), (memo.hits, memo.misses))
+
+    def test_reordered_tie(self):
+        """
+        Verifies reordering parts whose optimal packings tie gives the packing a fresh solve picks
+        """
+        parts = [{"volume": 5, "id": "part-a", "value": 5},
+                 {"volume": 5, "id": "part-b", "value": 5},
+                 {"volume": 10, "id": "part-c", "value": 10}]
+        memo = SolutionCache()
+        memo.solve(KnapSack01Solver(parts, 10))
+        reordered_parts = [parts[2], parts[0], parts[1]]
+        solver = KnapSack01Solver(reordered_parts, 10)
+        self.assertEqual((10, [1, 2]), solver.pick_items_dp())
+        self.assertEqual(solver.pick_items_dp(), memo.solve(solver))
+        self.assertEqual((0, 2), (memo.hits, memo.misses))
+
+    def test_duplicate_parts(self):
+        """
+        Verifies reordered identical parts get the ones pick_items_dp() would take
+        """
+        parts = [{"volume": 5, "id": "part-1", "value": 4},
+                 {"volume": 3, "id": "part-2", "value": 2},
+                 {"volume": 5, "id": "part-3", "value": 4},
+                 {"volume": 5, "id": "part-4", "value": 4}]
+        memo = SolutionCache()
+        memo.solve(KnapSack01Solver(parts, 13))
+        reordered_parts = [parts[1], parts[0], parts[3], parts[2]]
+        solver = KnapSack01Solver(reordered_parts, 13)
+        self.assertEqual(solver.pick_items_dp(), memo.solve(solver))
+        self.assertEqual((0, 2), (memo.hits, memo.misses))
+
+
+if __name__ == '__main__':
+    unittest.main()
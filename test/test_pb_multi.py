@@ -0,0 +1,103 @@
+import itertools
+import unittest
+from random import randint, seed
+
+from src.pack_sources import *
+from src.pb_get_json import grab_dict_from
+from src.pb_knapsack import KnapSack01Solver
+from src.pb_multi import MultiKnapSack01Solver
+from test.test_pb_knapsack import random_parts
+
+
+def brute_force_value(parts, volumes):
+    """
+    Best total value over every assignment of parts to suitcases (or to none); tiny inputs only
+    """
+    best_value = 0
+    for assignment in itertools.product(range(len(volumes) + 1), repeat=len(parts)):
+        spaces = list(volumes)
+        value = 0
+        for index, suitcase in enumerate(assignment):
+            if suitcase < len(volumes):
+                spaces[suitcase] -= parts[index]['volume']
+                value += parts[index]['value']
+        if min(spaces) >= 0:
+            best_value = max(best_value, value)
+    return best_value
+
+
+class TestMultiKnapSackSolver(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def assert_valid_packing(self, parts, volumes, total_value, packed):
+        chosen = [index for indices in packed for index in indices]
+        self.assertEqual(len(chosen), len(set(chosen)))
+        self.assertEqual(total_value, sum(parts[index]['value'] for index in chosen))
+        for volume, indices in zip(volumes, packed):
+            self.assertLessEqual(sum(parts[index]['volume'] for index in indices), volume)
+            self.assertEqual(sorted(indices), indices)
+
+    def test_against_brute_force(self):
+        """
+        Compares small random problems, zero volumes included, against trying every assignment
+        """
+        for trial in range(200):
+            parts = random_parts(randint(0, 7), 12, 9)
+            volumes = [randint(0, 20) for suitcase in range(randint(2, 3))]
+            solver = MultiKnapSack01Solver(parts, volumes)
+            total_value, packed = solver.pick_items_multi(reduce=bool(randint(0, 1)))
+            self.assertEqual(brute_force_value(parts, volumes), total_value)
+            self.assertEqual(total_value, solver.upper_bound)
+            self.assert_valid_packing(parts, volumes, total_value, packed)
+
+    def test_single_suitcase(self):
+        """
+        Verifies a single suitcase gives exactly the single knapsack answer
+        """
+        suitcase = grab_dict_from(file_suitcase)
+        parts = grab_dict_from(file_parts)
+        expected_result = KnapSack01Solver(parts, suitcase['volume']).pick_items_dp()
+        total_value, packed = MultiKnapSack01Solver(parts, [suitcase['volume']]).pick_items_multi('bits')
+        self.assertEqual(expected_result, (total_value, packed[0]))
+
+    def test_many_parts(self):
+        """
+        Verifies a few suitcases and 200 parts are packed optimally (the packing reaches the bound)
+        """
+        seed(5)
+        for suitcase_count in (3, 5):
+            parts = random_parts(200, 100, 100, min_volume=1)
+            volumes = [randint(250, 1000) for suitcase in range(suitcase_count)]
+            solver = MultiKnapSack01Solver(parts, volumes, deadline_ms=60000)
+            total_value, packed = solver.pick_items_multi()
+            self.assertEqual(solver.upper_bound, total_value)
+            self.assert_valid_packing(parts, volumes, total_value, packed)
+
+    def test_deep_search(self):
+        """
+        Verifies a search over more candidates than the recursion limit allows finishes optimally
+        """
+        seed(1)
+        parts = random_parts(1200, 91, 20, min_volume=51)
+        volumes = [100, 100, 100]
+        solver = MultiKnapSack01Solver(parts, volumes)
+        total_value, packed = solver.pick_items_multi('dp')
+        self.assertGreater(solver.nodes, 1200)
+        self.assertEqual(solver.upper_bound, total_value)
+        self.assert_valid_packing(parts, volumes, total_value, packed)
+
+    def test_deadline(self):
+        """
+        Verifies an exhausted deadline still returns a valid packing under a proven bound
+        """
+        parts = random_parts(40, 30, 30, min_volume=1)
+        volumes = [45, 47, 52]
+        solver = MultiKnapSack01Solver(parts, volumes, deadline_ms=0)
+        total_value, packed = solver.pick_items_multi()
+        self.assertLessEqual(total_value, solver.upper_bound)
+        self.assert_valid_packing(parts, volumes, total_value, packed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from src.pack_sources import *
+from src.pb_get_json import grab_dict_from
+from src.pb_knapsack import KnapSack01Solver, numpy
+from src.pb_parts import CompactParts, compact_parts_from
+from test.test_pb_knapsack import random_parts
+
+
+class TestCompactParts(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_streamed_parts(self):
+        """
+        Verifies a streamed parts list holds the same parts as the decoded one, in typed arrays
+        """
+        parts = grab_dict_from(file_parts)
+        compact_parts = compact_parts_from(file_parts, chunk_size=64)
+        self.assertEqual(len(parts), len(compact_parts))
+        self.assertEqual(parts, list(compact_parts))
+        self.assertEqual([part['id'] for part in parts], compact_parts.ids)
+        self.assertEqual('l', compact_parts.volumes.typecode)
+        self.assertEqual(parts[3:9], list(compact_parts[3:9]))
+
+    def test_engines_match_dicts(self):
+        """
+        Verifies every engine, with and without preprocessing, gives the same answer on compact parts
+            as on the equivalent list of dicts
+        """
+        suitcase = grab_dict_from(file_suitcase)
+        problems = [(grab_dict_from(file_parts), suitcase['volume'])]
+        problems += [(random_parts(12, 20, 8, min_volume=1), 60) for trial in range(10)]
+        engines = ['dp', 'bits', 'hirschberg', 'bnb', 'fptas', 'anytime'] + (['numpy'] if numpy else [])
+        for parts, volume in problems:
+            compact_parts = CompactParts()
+            for part in parts:
+                compact_parts.append(part)
+            for engine in engines:
+                for reduce in (False, True):
+                    self.assertEqual(KnapSack01Solver(parts, volume).solve(engine, reduce),
+                                     KnapSack01Solver(compact_parts, volume).solve(engine, reduce))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from random import randint
+
+from src.pack_sources import *
+from src.pb_get_json import grab_dict_from
+from src.pb_knapsack import KnapSack01Solver
+from src.pb_reduce import KnapSack01Reduction
+from test.test_pb_knapsack import random_parts
+
+
+class TestKnapSackReduction(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_rules(self):
+        """
+            test_rules() builds a small set of parts that each trigger one reduction and checks the
+                reduced problem and its expansion.
+        """
+        parts = [{"volume": 40, "id": "part-1", "value": 5},   # dominated by part-2 and part-3
+                 {"volume": 20, "id": "part-2", "value": 9},
+                 {"volume": 40, "id": "part-3", "value": 8},
+                 {"volume": 90, "id": "part-4", "value": 50},  # larger than the suitcase
+                 {"volume": 60, "id": "part-5", "value": 30},
+                 {"volume": 20, "id": "part-6", "value": -1}]  # negative value
+        reduction = KnapSack01Reduction(parts, 85)
+        self.assertEqual([0, 3, 5], reduction.excluded)
+        self.assertEqual([], reduction.forced)
+        self.assertEqual([1, 2, 4], reduction.index_map)
+        self.assertEqual(20, reduction.scale)
+        self.assertEqual(4, reduction.volume)
+        self.assertEqual([1, 2, 3], [part['volume'] for part in reduction.parts])
+        solver = KnapSack01Solver(parts, 85)
+        self.assertEqual(solver.pick_items_dp(), solver.solve('bits', reduce=True))
+
+    def test_everything_fits(self):
+        parts = [{"volume": 3, "id": "part-1", "value": 0},
+                 {"volume": 5, "id": "part-2", "value": 7}]
+        reduction = KnapSack01Reduction(parts, 8)
+        self.assertEqual([0, 1], reduction.forced)
+        self.assertEqual([], reduction.parts)
+        self.assertEqual((7, [0, 1]), reduction.expand(0, []))
+
+    def test_reduced_solution_matches_dp(self):
+        """
+            test_reduced_solution_matches_dp() verifies solving the reduced problem gives exactly the
+                pick_items_dp() result, ties and zero volume parts included.
+        """
+        suitcase = grab_dict_from(file_suitcase)
+        parts = grab_dict_from(file_parts)
+        solver = KnapSack01Solver(parts, suitcase['volume'])
+        self.assertEqual(solver.pick_items_dp(), solver.solve('bits', reduce=True))
+        for trial in range(200):
+            scale = randint(1, 3)
+            parts = random_parts(randint(0, 12), 20, 5, min_volume=randint(0, 1))
+            for part in parts:
+                part['volume'] *= scale
+            solver = KnapSack01Solver(parts, randint(0, 60))
+            self.assertEqual(solver.pick_items_dp(), solver.solve('dp', reduce=True),
+                             "reduced solution differs from dp for %s" % parts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import unittest
+
+from src.pack_sources import *
+from src.pb_get_json import fetch_many, set_fetch_observer, stream_json_from
+from src.pb_knapsack import KnapSack01Solver, numpy
+from src.pb_stats import RunStats
+from test.test_pb_knapsack import random_parts
+
+
+class TestRunStats(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_phases_and_counters(self):
+        """
+        Verifies phases are reported in the order they first ran with repeated phases added up, and counters
+            show up as fields of their own
+        """
+        stats = RunStats()
+        with stats.phase('fetch'):
+            pass
+        with stats.phase('solve'):
+            sum(xrange(100000))
+        with stats.phase('fetch'):
+            pass
+        stats.count('retries', 2)
+        report = stats.report()
+        self.assertEqual(['fetch', 'solve'], [phase['name'] for phase in report['phases']])
+        self.assertEqual(sum(phase['wall_s'] for phase in stats.phases if phase['name'] == 'fetch'),
+                         report['phases'][0]['wall_s'])
+        self.assertTrue(report['wall_s'] >= sum(phase['wall_s'] for phase in report['phases']))
+        self.assertEqual(2, report['retries'])
+        self.assertEqual(0, report['bytes_fetched'])
+        self.assertTrue(report['peak_rss_kb'] is None or report['peak_rss_kb'] > 0)
+
+    def test_bytes_fetched(self):
+        """
+        Verifies the fetch observer counts every byte read, whether fetched whole or streamed in chunks
+        """
+        stats = RunStats()
+        set_fetch_observer(stats.fetched)
+        try:
+            fetch_many([file_suitcase, file_parts])
+            self.assertEqual(os.path.getsize(file_suitcase) + os.path.getsize(file_parts),
+                             stats.report()['bytes_fetched'])
+            list(stream_json_from(file_parts, chunk_size=100))
+        finally:
+            set_fetch_observer(None)
+        self.assertEqual(os.path.getsize(file_suitcase) + 2 * os.path.getsize(file_parts),
+                         stats.report()['bytes_fetched'])
+
+    def test_solver_work(self):
+        """
+        Verifies the engines count the cells or nodes they evaluate, and preprocessing adds the reduced solve's
+        """
+        parts = random_parts(30, 50, 50)
+        stats = RunStats()
+        solver = KnapSack01Solver(parts, 200)
+        solver.solve('dp')
+        self.assertEqual(30 * 200, solver.cells)
+        stats.record_solver(solver)
+        solver = KnapSack01Solver(parts, 200)
+        solver.solve('bits')
+        cells = sum(max(0, 201 - max(part['volume'], 1)) for part in parts)
+        self.assertEqual(cells, solver.cells)
+        stats.record_solver(solver)
+        self.assertEqual(30 * 200 + cells, stats.report()['cells'])
+        if numpy is not None:
+            solver = KnapSack01Solver(parts, 200)
+            solver.solve('numpy')
+            self.assertEqual(cells, solver.cells)
+        solver = KnapSack01Solver(parts, 200, memory_budget=64)
+        solver.solve('hirschberg')
+        self.assertTrue(solver.cells > cells)
+        for engine in ('mitm', 'bnb', 'anytime'):
+            solver = KnapSack01Solver([part for part in parts if part['volume'] > 0][:16], 200)
+            solver.solve(engine)
+            self.assertTrue(solver.nodes > 0)
+            self.assertEqual(0, solver.cells)
+        solver = KnapSack01Solver(parts, 200)
+        solver.solve('bits', reduce=True)
+        self.assertEqual(0, solver.nodes)
+        self.assertTrue(solver.cells <= cells)
+
+
+if __name__ == '__main__':
+    unittest.main()